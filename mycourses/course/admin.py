@@ -69,3 +69,8 @@ admin.site.register(Certificate)
 admin.site.register(Review)
 admin.site.register(Exam)
 admin.site.register(Country)
+admin.site.register(ExamAttempt)
+admin.site.register(UploadSession)
+admin.site.register(GradebookEntry)
+admin.site.register(Notification)
+admin.site.register(MediaBlob)
@@ -0,0 +1,83 @@
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+
+from django.utils import timezone
+
+ARCHIVE_BLOCK_SIZE = 64 * 1024
+ARCHIVE_CHUNK_SIZE = 100  # сколько решений подгружается из БД за раз
+MANIFEST_NAME = 'manifest.csv'
+MANIFEST_COLUMNS = ('submission', 'students', 'submitted_at', 'grade', 'file')
+
+UNSAFE_NAME_RE = re.compile(r'[^\w.-]+', re.UNICODE)
+
+
+class ZipSink:
+    # Принимает то, что пишет zipfile, и отдаёт накопленное генератору; без tell/seek zipfile пишет
+    # data descriptor после каждого файла, так что архив собирается потоком без временного файла
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def safe_name(value):
+    return UNSAFE_NAME_RE.sub('_', value).strip('._') or 'file'
+
+
+def student_names(submission):
+    return [student.get_full_name() or student.username for student in submission.students.all()]
+
+
+def archive_name(submission):
+    students = '_'.join(student.username for student in submission.students.all())
+    return f'{submission.pk}_{safe_name(students)}/{safe_name(submission.submission_file.name.rsplit("/", 1)[-1])}'
+
+
+def zip_date_time(value):
+    # В ZIP время локальное и без зоны, раньше 1980 года не бывает
+    value = timezone.localtime(value) if timezone.is_aware(value) else value
+    return max(value.replace(tzinfo=None), datetime(1980, 1, 1)).timetuple()[:6]
+
+
+def stream_submissions_zip(submissions):
+    # Генератор байтов ZIP: решения читаются блоками по ARCHIVE_BLOCK_SIZE, в конце пишется manifest.csv
+    sink = ZipSink()
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(MANIFEST_COLUMNS)
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for submission in submissions.iterator(chunk_size=ARCHIVE_CHUNK_SIZE):
+            name = ''
+            if submission.submission_file:
+                try:
+                    source = submission.submission_file.open('rb')
+                except FileNotFoundError:
+                    name = 'missing'
+                else:
+                    name = archive_name(submission)
+                    info = zipfile.ZipInfo(name, date_time=zip_date_time(submission.submitted_at))
+                    info.file_size = submission.submission_file.size
+                    with source, archive.open(info, 'w') as target:
+                        while block := source.read(ARCHIVE_BLOCK_SIZE):
+                            target.write(block)
+                            yield sink.pop()
+            writer.writerow((submission.pk, ', '.join(student_names(submission)),
+                             timezone.localtime(submission.submitted_at).isoformat(), submission.grade or '', name))
+        info = zipfile.ZipInfo(MANIFEST_NAME, date_time=zip_date_time(timezone.now()))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        archive.writestr(info, manifest.getvalue().encode('utf-8-sig'))
+    yield sink.pop()
@@ -0,0 +1,57 @@
+import csv
+import io
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .exam_import import error_messages, indexed_errors
+from .gradebook import record_submission_grades
+from .models import AssignmentSubmission
+from .serializers import BulkGradeSerializer
+
+GRADES_CSV_COLUMNS = ('submission', 'grade')
+
+
+def read_grades_csv(stream):
+    # Строки CSV (submission, grade) и их номера в файле, чтобы сообщать ошибки по строкам
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    reader = csv.DictReader(stream)
+    missing = set(GRADES_CSV_COLUMNS) - set(reader.fieldnames or ())
+    if missing:
+        raise serializers.ValidationError({'file': [f'Нет колонок: {", ".join(sorted(missing))}']})
+    grades, lines = [], []
+    for row in reader:
+        grades.append({name: (row[name] or '').strip() for name in GRADES_CSV_COLUMNS})
+        lines.append(reader.line_num)
+    return {'grades': grades}, lines
+
+
+def grade_errors(errors, lines=None):
+    rows = {}
+    for index, error in indexed_errors(errors) or ():
+        rows.setdefault(str(lines[index] if lines else index + 1), []).extend(error_messages(error))
+    return rows
+
+
+def apply_grades(assignment, data, lines=None):
+    # Проверяет все оценки и записывает их одним bulk_update; при любой ошибке ничего не меняется
+    serializer = BulkGradeSerializer(data=data)
+    if not serializer.is_valid():
+        rows = grade_errors(serializer.errors.get('grades'), lines)
+        raise serializers.ValidationError({'lines' if lines else 'grades': rows} if rows else serializer.errors)
+
+    grades = serializer.validated_data['grades']
+    submissions = AssignmentSubmission.objects.filter(assignment=assignment, pk__in=grades).only('id', 'grade')
+    submissions = {submission.pk: submission for submission in submissions}
+    unknown = {str(lines[index] if lines else index + 1): [f'Решение {pk} не относится к этому заданию']
+               for index, pk in enumerate(grades) if pk not in submissions}
+    if unknown:
+        raise serializers.ValidationError({'lines' if lines else 'grades': unknown})
+
+    for pk, grade in grades.items():
+        submissions[pk].grade = grade
+    with transaction.atomic():
+        AssignmentSubmission.objects.bulk_update(submissions.values(), ['grade'])
+        record_submission_grades(list(submissions))
+    return list(submissions.values())
@@ -0,0 +1,194 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .exam_stats import StatsCollector, record_attempts
+from .gradebook import record_exam_scores
+from .grading import answer_key, answer_rows, exam_result, known_answers, validate_answers
+from .models import ExamAttempt, UserAnswer
+
+ATTEMPT_GRACE_PERIOD = timedelta(seconds=30)  # запас на сетевую задержку последнего запроса
+AUTOSAVE_FLUSH_INTERVAL = 30
+AUTOSAVE_BATCH_SIZE = 100
+DRAFT_TIMEOUT = 60 * 60 * 24
+EXPIRE_BATCH_SIZE = 500
+
+
+def attempt_cache_key(exam_id, student_id):
+    return f'exam_attempt:{exam_id}:{student_id}'
+
+
+def draft_cache_key(attempt_id):
+    return f'exam_attempt_draft:{attempt_id}'
+
+
+def dump_answers(answers):
+    return {str(question_id): sorted(choice_ids) for question_id, choice_ids in answers.items()}
+
+
+def load_answers(data):
+    return {int(question_id): set(choice_ids) for question_id, choice_ids in data.items()}
+
+
+def is_expired(expires_at, now=None):
+    return (now or timezone.now()) > expires_at + ATTEMPT_GRACE_PERIOD
+
+
+def remember_attempt(attempt):
+    timeout = max((attempt.expires_at + ATTEMPT_GRACE_PERIOD - timezone.now()).total_seconds(), 1)
+    cache.set(attempt_cache_key(attempt.exam_id, attempt.student_id), (attempt.pk, attempt.expires_at), timeout)
+
+
+def active_attempt(exam_id, student_id):
+    # (id, expires_at) активной попытки; пока запись в кэше, heartbeat не ходит в БД
+    active = cache.get(attempt_cache_key(exam_id, student_id))
+    if active is None:
+        attempt = (ExamAttempt.objects.filter(exam_id=exam_id, student_id=student_id, status=ExamAttempt.IN_PROGRESS)
+                   .only('id', 'exam_id', 'student_id', 'expires_at').first())
+        if attempt is None:
+            return None
+        remember_attempt(attempt)
+        active = (attempt.pk, attempt.expires_at)
+    return active
+
+
+class AutosaveBuffer:
+    # Последний черновик попытки лежит в общем кэше (его видят сборщик и другие воркеры), а в БД изменённые
+    # попытки уходят пачкой одним bulk_update — по размеру пачки или по времени
+
+    def __init__(self, batch_size=AUTOSAVE_BATCH_SIZE, interval=AUTOSAVE_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.since = None
+
+    def add(self, attempt_id):
+        with self.lock:
+            self.pending.add(attempt_id)
+            if self.since is None:
+                self.since = time.monotonic()
+            due = len(self.pending) >= self.batch_size or time.monotonic() - self.since >= self.interval
+        if due:
+            self.flush()
+
+    def discard(self, attempt_ids):
+        with self.lock:
+            self.pending.difference_update(attempt_ids)
+
+    def flush(self):
+        with self.lock:
+            attempt_ids, self.pending, self.since = self.pending, set(), None
+        return save_drafts(attempt_ids)
+
+
+def save_drafts(attempt_ids):
+    keys = {draft_cache_key(pk): pk for pk in attempt_ids}
+    now = timezone.now()
+    attempts = [ExamAttempt(pk=keys[key], answers=draft, saved_at=now) for key, draft in cache.get_many(keys).items()]
+    if not attempts:
+        return 0
+    # bulk_update сохраняет фильтр queryset: закрытая тем временем попытка не перезаписывается черновиком
+    return ExamAttempt.objects.filter(status=ExamAttempt.IN_PROGRESS).bulk_update(attempts, ['answers', 'saved_at'])
+
+
+autosave_buffer = AutosaveBuffer()
+
+
+def autosave(attempt_id, answers):
+    cache.set(draft_cache_key(attempt_id), dump_answers(answers), DRAFT_TIMEOUT)
+    autosave_buffer.add(attempt_id)
+
+
+def current_answers(attempt):
+    draft = cache.get(draft_cache_key(attempt.pk))
+    return load_answers(draft if draft is not None else attempt.answers)
+
+
+def start_attempt(exam, student_id):
+    # Возвращает (попытка, создана ли); незавершённая попытка продолжается, просроченная сначала закрывается
+    active = active_attempt(exam.pk, student_id)
+    if active is not None:
+        if not is_expired(active[1]):
+            attempt = ExamAttempt.objects.get(pk=active[0])
+            attempt.answers = dump_answers(current_answers(attempt))
+            return attempt, False
+        submit_attempt(exam.pk, student_id)
+    try:
+        with transaction.atomic():
+            attempt = ExamAttempt.objects.create(student_id=student_id, exam=exam,
+                                                 expires_at=timezone.now() + timedelta(minutes=exam.duration))
+    except IntegrityError:
+        # параллельный запрос уже начал попытку
+        cache.delete(attempt_cache_key(exam.pk, student_id))
+        return start_attempt(exam, student_id)
+    remember_attempt(attempt)
+    answer_key(exam.pk)  # прогреваем ключ ответов, по которому проверяются автосохранения
+    return attempt, True
+
+
+def close_attempts(attempts, status, answers=None):
+    # answers — {id попытки: ответы}; для остальных попыток берётся черновик из общего кэша, а если его там нет —
+    # последний сброшенный в БД. Вызывающий держит блокировку строк попыток
+    answers = answers or {}
+    now = timezone.now()
+    drafts = cache.get_many([draft_cache_key(attempt.pk) for attempt in attempts])
+    rows, results, stats = [], {}, StatsCollector()
+    for attempt in attempts:
+        key = answer_key(attempt.exam_id)
+        given = answers.get(attempt.pk)
+        if given is None:
+            given = known_answers(key, load_answers(drafts.get(draft_cache_key(attempt.pk), attempt.answers)))
+        rows.extend(answer_rows(key, attempt.student_id, given, attempt.pk))
+        result = exam_result(attempt.exam, key, given)
+        stats.add(attempt.exam_id, key, given, result['score'])
+        attempt.status, attempt.submitted_at = status, now
+        attempt.answers, attempt.score = dump_answers(given), result['score']
+        results[attempt.pk] = {'attempt': attempt.pk, 'status': status, **result}
+    with transaction.atomic():
+        UserAnswer.objects.bulk_create(rows)
+        ExamAttempt.objects.bulk_update(attempts, ['status', 'submitted_at', 'answers', 'score'])
+        record_attempts(stats)
+        record_exam_scores(attempts)
+    cache.delete_many([key for attempt in attempts for key in (
+        draft_cache_key(attempt.pk), attempt_cache_key(attempt.exam_id, attempt.student_id),
+    )])
+    autosave_buffer.discard(results)
+    return results
+
+
+def submit_attempt(exam_id, student_id, answers=None):
+    # Ответы, присланные после expires_at + запас, не принимаются: попытка закрывается по последнему черновику
+    if answers is not None:
+        validate_answers(answer_key(exam_id), answers)
+    with transaction.atomic():
+        attempt = (ExamAttempt.objects.select_for_update(of=('self',)).select_related('exam')
+                   .filter(exam_id=exam_id, student_id=student_id, status=ExamAttempt.IN_PROGRESS).first())
+        if attempt is None:
+            raise serializers.ValidationError('Нет активной попытки этого экзамена')
+        if is_expired(attempt.expires_at):
+            return close_attempts([attempt], ExamAttempt.EXPIRED)[attempt.pk]
+        given = {attempt.pk: answers} if answers is not None else None
+        return close_attempts([attempt], ExamAttempt.SUBMITTED, given)[attempt.pk]
+
+
+def expire_attempts(batch_size=EXPIRE_BATCH_SIZE):
+    # Просроченные попытки выбираются по индексу (status, expires_at) и закрываются пачками
+    deadline = timezone.now() - ATTEMPT_GRACE_PERIOD
+    expired = 0
+    while True:
+        with transaction.atomic():
+            attempts = list(
+                ExamAttempt.objects.select_for_update(skip_locked=True, of=('self',)).select_related('exam')
+                .filter(status=ExamAttempt.IN_PROGRESS, expires_at__lt=deadline).order_by('expires_at')[:batch_size]
+            )
+            if attempts:
+                close_attempts(attempts, ExamAttempt.EXPIRED)
+        expired += len(attempts)
+        if len(attempts) < batch_size:
+            return expired
@@ -0,0 +1,129 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import bump_versions, get_version
+from .models import UserProfile
+
+AUTH_USER_CACHE_TIMEOUT = 60 * 5  # общий кэш; запись устаревает сразу при смене версии user:<id>
+AUTH_LOCAL_CACHE_TIMEOUT = 5  # кэш процесса: другие процессы узнают о деактивации не позже чем через столько секунд
+AUTH_LOCAL_CACHE_SIZE = 1024
+
+ROLES = ('teacher', 'student')
+
+
+def user_version_name(user_id):
+    return f'user:{user_id}'
+
+
+def user_cache_key(user_id, version):
+    return f'auth_user:{user_id}:{version}'
+
+
+def load_user(user_id):
+    # Один запрос: профиль вместе с ролью; возвращается конкретный Teacher/Student, у которого проверки
+    # hasattr(user, 'teacher') / hasattr(user, 'student') уже закэшированы и запросов не делают
+    user = UserProfile.objects.select_related(*ROLES).filter(pk=user_id).first()
+    if user is None:
+        return None
+    concrete = next((getattr(user, role) for role in ROLES if hasattr(user, role)), user)
+    for role in ROLES:
+        concrete._state.fields_cache[role] = concrete if concrete._meta.model_name == role else None
+    return concrete
+
+
+class LocalUserCache:
+    # LRU в памяти процесса; хранит сериализованного пользователя, чтобы запросы не делили один объект.
+    # Ключ — строка: simplejwt кладёт id пользователя в токен строкой, а сигналы передают число
+
+    def __init__(self, size=AUTH_LOCAL_CACHE_SIZE, timeout=AUTH_LOCAL_CACHE_TIMEOUT):
+        self.size, self.timeout = size, timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            self.entries.move_to_end(user_id)
+        return pickle.loads(entry[1])
+
+    def set(self, user_id, data):
+        user_id = str(user_id)
+        with self.lock:
+            self.entries[user_id] = (time.monotonic() + self.timeout, data)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_user_cache = LocalUserCache()
+
+
+def invalidate_users(user_ids):
+    # Сбрасывает закэшированных пользователей после коммита: раньше другой запрос успел бы снова закэшировать
+    # старую строку. save()/delete() профиля и ролей вызывают его через сигналы; после
+    # UserProfile.objects.filter(...).update(is_active=False) и других массовых правок его нужно вызвать явно
+    user_ids = list(user_ids)
+    bump_versions([user_version_name(user_id) for user_id in user_ids])
+
+    def discard():
+        for user_id in user_ids:
+            local_user_cache.discard(user_id)
+    transaction.on_commit(discard)
+
+
+def get_cached_user(user_id):
+    user = local_user_cache.get(user_id)
+    if user is not None:
+        return user
+    # Версия читается до загрузки из БД: если профиль сохранят в это время, устаревшая запись окажется под старой версией
+    key = user_cache_key(user_id, get_version(user_version_name(user_id)))
+    data = cache.get(key)
+    if data is None:
+        user = load_user(user_id)
+        if user is None:
+            return None
+        data = pickle.dumps(user, pickle.HIGHEST_PROTOCOL)
+        cache.set(key, data, AUTH_USER_CACHE_TIMEOUT)
+    local_user_cache.set(user_id, data)
+    return pickle.loads(data)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    # То же, что JWTAuthentication, но пользователь берётся из кэша; сбрасывается при сохранении и удалении профиля
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
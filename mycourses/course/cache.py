@@ -0,0 +1,161 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+from rest_framework.response import Response
+
+CATALOG_CACHE_TIMEOUT = 60 * 10  # сколько запись хранится в кэше
+CATALOG_FRESH_TIMEOUT = 60  # после этого запись устарела и её пересчитывает один запрос, взявший блокировку
+CATALOG_LOCK_TIMEOUT = 10
+CATALOG_LOCK_WAIT = 2
+CATALOG_LOCK_POLL = 0.05
+VERSION_TIMEOUT = None
+
+
+def version_key(name):
+    return f'version:{name}'
+
+
+def get_version(name):
+    # Версия — время последнего изменения в наносекундах; при вытеснении из кэша заводится заново
+    key = version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(names):
+    keys = {version_key(name): name for name in names}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        for key, value in missing.items():
+            cache.add(key, value, VERSION_TIMEOUT)
+        found.update(cache.get_many(missing))
+    return [found.get(key, missing.get(key)) for key in keys]
+
+
+def bump_versions(names):
+    # Версии меняются только после коммита: иначе параллельный GET прочитает новую версию и старые строки
+    # и закэширует их под новым ключом. Вне транзакции on_commit выполняется сразу
+    names = list(names)
+    if names:
+        transaction.on_commit(lambda: cache.set_many({version_key(name): time.time_ns() for name in names},
+                                                     VERSION_TIMEOUT))
+
+
+def bump_catalog(course_ids=()):
+    bump_versions(['catalog', *(f'course:{pk}' for pk in course_ids)])
+
+
+def normalized_query(params):
+    return '&'.join(f'{key}={value}' for key in sorted(params) for value in sorted(params.getlist(key)))
+
+
+def catalog_cache_key(request, version_names):
+    versions = '.'.join(str(version) for version in get_versions(version_names))
+    signature = f'{request.get_host()}|{request.path}|{get_language()}|{normalized_query(request.query_params)}'
+    return f'catalog:{hashlib.md5(signature.encode()).hexdigest()}:{versions}'
+
+
+def get_or_compute(key, compute):
+    # Защита от «stampede»: пересчитывает только тот, кто взял блокировку, остальные получают устаревшие данные
+    # или ждут, пока появится свежая запись
+    entry = cache.get(key)
+    if entry is not None and entry[0] > time.time():
+        return entry[1]
+
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, CATALOG_LOCK_TIMEOUT):
+        if entry is not None:
+            return entry[1]
+        deadline = time.monotonic() + CATALOG_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(CATALOG_LOCK_POLL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[1]
+        return compute()
+
+    try:
+        value = compute()
+        if value is not None:
+            cache.set(key, (time.time() + CATALOG_FRESH_TIMEOUT, value), CATALOG_CACHE_TIMEOUT)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+class CatalogCacheMixin:
+    # Кэширует ответы GET каталога; ответ не зависит от пользователя, только от языка и параметров запроса
+    catalog_cache_versions = ('catalog',)
+
+    def get_catalog_cache_versions(self):
+        return [name.format(**self.kwargs) for name in self.catalog_cache_versions]
+
+    def get(self, request, *args, **kwargs):
+        responses = []
+
+        def compute():
+            response = super(CatalogCacheMixin, self).get(request, *args, **kwargs)
+            responses.append(response)
+            return response.data if response.status_code == 200 else None
+
+        data = get_or_compute(catalog_cache_key(request, self.get_catalog_cache_versions()), compute)
+        if responses:
+            return responses[0]
+        if data is None:
+            return super().get(request, *args, **kwargs)
+        return Response(data)
+
+
+class ConditionalGetMixin:
+    # ETag и Last-Modified берутся из версий в кэше, тело ответа для проверки не строится
+    conditional_versions = ()
+
+    def get_conditional_versions(self):
+        return [name.format(**self.kwargs) for name in self.conditional_versions]
+
+    def check_conditional_object(self):
+        # 304 только для существующего и доступного объекта: те же фильтры, 404 и проверка прав, что в get_object(),
+        # но без prefetch — тело ответа не строится
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        if lookup not in self.kwargs:
+            return
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        obj = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup]})
+        self.check_object_permissions(self.request, obj)
+
+    def get(self, request, *args, **kwargs):
+        names = self.get_conditional_versions()
+        versions = get_versions(names)
+        accept = request.META.get('HTTP_ACCEPT', '')
+        signature = f'{names}|{versions}|{get_language()}|{accept}|{normalized_query(request.query_params)}'
+        etag = quote_etag(hashlib.md5(signature.encode()).hexdigest())
+        last_modified = max(versions) // 10 ** 9 if versions else None
+        if last_modified is not None and last_modified >= int(time.time()):
+            # Секунда последней записи ещё идёт: вторая запись в ту же секунду дала бы тот же Last-Modified,
+            # поэтому до её конца проверка идёт только по ETag
+            last_modified = None
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            self.check_conditional_object()
+        if not_modified is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        else:
+            response = Response(status=not_modified.status_code)
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Accept', 'Accept-Language', 'Authorization'))
+        return response
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Assignment, AssignmentSubmission, Notification
+
+REMINDER_WINDOW = timedelta(hours=24)
+DEADLINE_BATCH_SIZE = 500
+NOTIFICATION_BATCH_SIZE = 1000
+
+AssignmentStudents = Assignment.students.through
+SubmissionStudents = AssignmentSubmission.students.through
+
+
+def missing_submitters(assignment_ids):
+    # Пары (задание, студент) без решения — одним запросом с NOT EXISTS, без обхода студентов в Python
+    submitted = SubmissionStudents.objects.filter(
+        assignmentsubmission__assignment_id=OuterRef('assignment_id'), userprofile_id=OuterRef('student_id'),
+    )
+    return (AssignmentStudents.objects.filter(assignment_id__in=assignment_ids)
+            .exclude(Exists(submitted)).values_list('assignment_id', 'student_id'))
+
+
+def notify_missing(assignments, kind, message):
+    names = {assignment.pk: assignment.assignment_name for assignment in assignments}
+    notifications = (
+        Notification(recipient_id=student_id, assignment_id=assignment_id, kind=kind,
+                     message=message.format(name=names[assignment_id]))
+        for assignment_id, student_id in missing_submitters(list(names)).iterator(chunk_size=NOTIFICATION_BATCH_SIZE)
+    )
+    # bulk_create с ignore_conflicts возвращает и пропущенные строки, поэтому созданные считаются по разнице
+    # числа уведомлений до и после вставки
+    sent = Notification.objects.filter(assignment_id__in=list(names), kind=kind)
+    with transaction.atomic():
+        before = sent.count()
+        batch = []
+        for notification in notifications:
+            batch.append(notification)
+            if len(batch) == NOTIFICATION_BATCH_SIZE:
+                Notification.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        Notification.objects.bulk_create(batch, ignore_conflicts=True)
+        return sent.count() - before
+
+
+def assignment_batches(queryset, batch_size):
+    # Выборка по индексу (is_closed, due_date); обработанные задания выпадают из условия, поэтому берём
+    # всегда первую пачку, пока она не опустеет
+    while True:
+        batch = list(queryset.order_by('due_date', 'pk').only('id', 'assignment_name', 'due_date')[:batch_size])
+        if not batch:
+            return
+        yield batch
+
+
+def send_reminders(now=None, window=REMINDER_WINDOW, batch_size=DEADLINE_BATCH_SIZE):
+    now = now or timezone.now()
+    due = Assignment.objects.filter(is_closed=False, due_date__gt=now, due_date__lte=now + window,
+                                    reminder_sent_at__isnull=True)
+    assignments = notifications = 0
+    for batch in assignment_batches(due, batch_size):
+        notifications += notify_missing(batch, Notification.DEADLINE_REMINDER,
+                                        'Скоро срок сдачи задания «{name}»')
+        Assignment.objects.filter(pk__in=[assignment.pk for assignment in batch]).update(reminder_sent_at=now)
+        assignments += len(batch)
+    return assignments, notifications
+
+
+def close_overdue(now=None, batch_size=DEADLINE_BATCH_SIZE):
+    now = now or timezone.now()
+    overdue = Assignment.objects.filter(is_closed=False, due_date__lte=now)
+    assignments = notifications = 0
+    for batch in assignment_batches(overdue, batch_size):
+        notifications += notify_missing(batch, Notification.ASSIGNMENT_CLOSED,
+                                        'Приём решений по заданию «{name}» закрыт')
+        Assignment.objects.filter(pk__in=[assignment.pk for assignment in batch]).update(is_closed=True)
+        assignments += len(batch)
+    return assignments, notifications
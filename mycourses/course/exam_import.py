@@ -0,0 +1,89 @@
+import csv
+import io
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .exam_papers import publish_exam_papers
+from .serializers import ExamImportSerializer
+
+CSV_COLUMNS = ('question', 'choice', 'is_correct')
+EXAM_FIELDS = ('exam_name', 'course', 'passing_score', 'duration')
+
+
+# Документ экзамена:
+#   JSON — {"exam_name", "course", "passing_score", "duration", "questions": [{"text", "choices": [{"text", "is_correct"}]}]}
+#   CSV  — строка на вариант ответа с колонками question, choice, is_correct; пустая ячейка question продолжает
+#          предыдущий вопрос, поля экзамена передаются отдельно
+
+
+def read_exam_csv(stream, exam_fields):
+    # Возвращает документ экзамена и номера строк CSV для каждого вопроса и варианта, чтобы сообщать ошибки по строкам
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig')
+    reader = csv.DictReader(stream)
+    missing = set(CSV_COLUMNS) - set(reader.fieldnames or ())
+    if missing:
+        raise serializers.ValidationError({'file': [f'Нет колонок: {", ".join(sorted(missing))}']})
+
+    questions, lines = [], []
+    for row in reader:
+        text = (row['question'] or '').strip()
+        if text or not questions:
+            questions.append({'text': text, 'choices': []})
+            lines.append([])
+        choice = {'text': (row['choice'] or '').strip()}
+        if (row['is_correct'] or '').strip():
+            choice['is_correct'] = row['is_correct'].strip()
+        questions[-1]['choices'].append(choice)
+        lines[-1].append(reader.line_num)
+    data = {name: exam_fields[name] for name in EXAM_FIELDS if exam_fields.get(name) not in (None, '')}
+    data['questions'] = questions
+    return data, lines
+
+
+def error_messages(errors, prefix=''):
+    if isinstance(errors, dict):
+        return [message for name, value in errors.items()
+                for message in error_messages(value, f'{prefix}{name}: ' if name != 'non_field_errors' else prefix)]
+    return [f'{prefix}{error}' for error in errors]
+
+
+def indexed_errors(errors):
+    # Ошибки по элементам списка: DRF отдаёт {индекс: ошибки} (в старых версиях — список словарей);
+    # ошибка самого списка — список строк, для неё возвращается None
+    if isinstance(errors, dict) and all(isinstance(index, int) for index in errors):
+        return sorted(errors.items())
+    if isinstance(errors, list) and any(isinstance(error, dict) for error in errors):
+        return [(index, error) for index, error in enumerate(errors) if error]
+    return None
+
+
+def row_errors(errors, lines=None):
+    # Ошибки вопросов и вариантов превращаются в {номер строки: сообщения}; без lines нумеруются вопросы с 1
+    questions = indexed_errors(errors.get('questions'))
+    if questions is None:
+        return errors
+    rows = {}
+    for index, question in questions:
+        choices = indexed_errors(question.get('choices'))
+        if choices is not None:
+            for choice_index, choice in choices:
+                line = lines[index][choice_index] if lines else f'{index + 1}.{choice_index + 1}'
+                rows.setdefault(str(line), []).extend(error_messages(choice))
+            question = {name: value for name, value in question.items() if name != 'choices'}
+        if question:
+            line = lines[index][0] if lines else index + 1
+            rows.setdefault(str(line), []).extend(error_messages(question))
+    result = {name: value for name, value in errors.items() if name != 'questions'}
+    result['lines' if lines else 'questions'] = rows
+    return result
+
+
+def import_exam(data, teacher, lines=None):
+    serializer = ExamImportSerializer(data=data, context={'teacher': teacher})
+    if not serializer.is_valid():
+        raise serializers.ValidationError(row_errors(serializer.errors, lines))
+    exam = serializer.save(teacher=teacher)
+    transaction.on_commit(lambda: publish_exam_papers(exam.pk))
+    return exam
@@ -0,0 +1,132 @@
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import translation
+from django.utils.translation import get_supported_language_variant
+from rest_framework.settings import api_settings
+
+from .cache import CATALOG_LOCK_POLL, CATALOG_LOCK_TIMEOUT, CATALOG_LOCK_WAIT, get_version, get_versions
+from .models import Exam
+from .serializers import ExamPaperSerializer
+
+PAPER_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Билет экзамена — готовый ответ первого рендерера (JSON) с вопросами и вариантами без is_correct.
+# Версия складывается из exam:<pk> (сигналы Exam/Question/Choice) и course:<id> его курса — в билете есть
+# карточка курса; правки других курсов билет не трогают.
+# Билет собирается без запроса, ссылки на изображения в нём относительные: один файл на (экзамен, версия, язык),
+# сколько бы адресов (заголовков Host) у сайта ни было
+
+
+def paper_renderer():
+    return api_settings.DEFAULT_RENDERER_CLASSES[0]()
+
+
+def exam_course_cache_key(exam_id, exam_version):
+    return f'exam_course:{exam_id}:{exam_version}'
+
+
+def paper_version_names(exam_id):
+    # Курс экзамена запоминается в кэше под версией экзамена: сохранение экзамена (в том числе перенос
+    # в другой курс) меняет версию, и курс читается заново. Несуществующий экзамен — только exam:<pk>
+    exam_version = get_version(f'exam:{exam_id}')
+    key = exam_course_cache_key(exam_id, exam_version)
+    course_id = cache.get(key)
+    if course_id is None:
+        course_id = Exam.objects.filter(pk=exam_id).values_list('course_id', flat=True).first()
+        if course_id is None:
+            return [f'exam:{exam_id}']
+        cache.set(key, course_id, PAPER_CACHE_TIMEOUT)
+    return [f'exam:{exam_id}', f'course:{course_id}']
+
+
+def paper_version(exam_id):
+    return '.'.join(str(version) for version in get_versions(paper_version_names(exam_id)))
+
+
+def paper_language(language):
+    try:
+        return get_supported_language_variant(language or settings.LANGUAGE_CODE)
+    except LookupError:
+        return settings.LANGUAGE_CODE
+
+
+def paper_cache_key(exam_id, language, version):
+    return f'exam_paper:{exam_id}:{language}:{version}'
+
+
+def paper_path(exam_id, language, version):
+    return Path(settings.EXAM_PAPERS_ROOT) / str(exam_id) / f'{language}-{version}.json'
+
+
+def build_paper(exam_id, language):
+    exam = (Exam.objects.select_related('course__category')
+            .prefetch_related('course__skills', 'questions__choices').get(pk=exam_id))
+    with translation.override(language):
+        data = ExamPaperSerializer(exam).data
+    return paper_renderer().render(data)
+
+
+def publish_paper(exam_id, language, version=None):
+    version = version or paper_version(exam_id)
+    content = build_paper(exam_id, language)
+    path = paper_path(exam_id, language, version)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_suffix('.tmp')
+    temporary.write_bytes(content)
+    os.replace(temporary, path)
+    for old in path.parent.glob(f'{language}-*.json'):
+        if old != path:
+            old.unlink(missing_ok=True)
+    cache.set(paper_cache_key(exam_id, language, version), content, PAPER_CACHE_TIMEOUT)
+    return content
+
+
+def publish_exam_papers(exam_id):
+    for language, _ in settings.LANGUAGES:
+        publish_paper(exam_id, language)
+
+
+def get_paper(exam_id, language):
+    language = paper_language(language)
+    version = paper_version(exam_id)
+    key = paper_cache_key(exam_id, language, version)
+    content = cache.get(key)
+    if content is None:
+        path = paper_path(exam_id, language, version)
+        if path.exists():
+            content = path.read_bytes()
+            cache.set(key, content, PAPER_CACHE_TIMEOUT)
+        else:
+            content = publish_locked(key, exam_id, language, version)
+    return content
+
+
+def publish_locked(key, exam_id, language, version):
+    # Защита от «stampede» в начале экзамена — как в cache.get_or_compute: билет собирает тот, кто взял
+    # блокировку, остальные ждут его в кэше и только по истечении ожидания собирают сами
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, CATALOG_LOCK_TIMEOUT):
+        try:
+            return publish_paper(exam_id, language, version)
+        finally:
+            cache.delete(lock_key)
+    deadline = time.monotonic() + CATALOG_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(CATALOG_LOCK_POLL)
+        content = cache.get(key)
+        if content is not None:
+            return content
+    return publish_paper(exam_id, language, version)
+
+
+def remove_exam_papers(exam_id):
+    directory = Path(settings.EXAM_PAPERS_ROOT) / str(exam_id)
+    for path in directory.glob('*.json'):
+        path.unlink(missing_ok=True)
+    if directory.exists() and not any(directory.iterdir()):
+        directory.rmdir()
@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from .grading import answer_key, correct_questions, known_answers
+from .models import ChoiceStats, ExamAttempt, QuestionStats
+
+QUESTION_COUNTERS = ('attempts', 'correct', 'score_sum', 'score_squares_sum', 'correct_score_sum')
+REBUILD_CHUNK_SIZE = 2000
+
+
+class StatsCollector:
+    # Складывает вклад проверенных попыток в счётчики вопросов и вариантов, чтобы записать их пачкой
+
+    def __init__(self):
+        self.questions = defaultdict(lambda: dict.fromkeys(QUESTION_COUNTERS, 0))
+        self.choices = defaultdict(int)
+        self.question_exams = {}
+        self.choice_exams = {}
+
+    def add(self, exam_id, key, answers, score):
+        correct = correct_questions(key, answers)
+        for question_id, choices in key.items():
+            counters = self.questions[question_id]
+            counters['attempts'] += 1
+            counters['score_sum'] += score
+            counters['score_squares_sum'] += score * score
+            if question_id in correct:
+                counters['correct'] += 1
+                counters['correct_score_sum'] += score
+            self.question_exams[question_id] = exam_id
+            for choice_id in answers.get(question_id, ()):
+                self.choices[choice_id] += 1
+                self.choice_exams[choice_id] = exam_id
+
+    def question_rows(self):
+        return [QuestionStats(question_id=pk, exam_id=self.question_exams[pk], **counters)
+                for pk, counters in self.questions.items()]
+
+    def choice_rows(self):
+        return [ChoiceStats(choice_id=pk, exam_id=self.choice_exams[pk], picks=picks)
+                for pk, picks in self.choices.items()]
+
+
+def increment(model, rows, counters):
+    # Одна вставка недостающих строк и один UPDATE с CASE на каждую таблицу, сколько бы попыток ни пришло
+    if not rows:
+        return
+    pk_name = model._meta.pk.attname
+    model.objects.bulk_create([model(**{pk_name: getattr(row, pk_name), 'exam_id': row.exam_id}) for row in rows],
+                              ignore_conflicts=True)
+    model.objects.filter(pk__in=[getattr(row, pk_name) for row in rows]).update(**{
+        name: F(name) + Case(*(When(pk=getattr(row, pk_name), then=Value(getattr(row, name))) for row in rows),
+                             default=Value(0))
+        for name in counters
+    })
+
+
+def record_attempts(collector):
+    with transaction.atomic():
+        increment(QuestionStats, collector.question_rows(), QUESTION_COUNTERS)
+        increment(ChoiceStats, collector.choice_rows(), ('picks',))
+
+
+def rebuild_exam_stats(exam_ids, chunk_size=REBUILD_CHUNK_SIZE):
+    # Проход по закрытым попыткам потоком; в памяти только счётчики, их размер зависит от числа вопросов
+    collector = StatsCollector()
+    attempts = (ExamAttempt.objects.filter(exam_id__in=exam_ids, score__isnull=False)
+                .exclude(status=ExamAttempt.IN_PROGRESS).order_by().values_list('exam_id', 'answers', 'score'))
+    keys = {}
+    for exam_id, answers, score in attempts.iterator(chunk_size=chunk_size):
+        if exam_id not in keys:
+            keys[exam_id] = answer_key(exam_id)
+        given = known_answers(keys[exam_id], {int(pk): set(choices) for pk, choices in answers.items()})
+        collector.add(exam_id, keys[exam_id], given, score)
+    with transaction.atomic():
+        QuestionStats.objects.filter(exam_id__in=exam_ids).delete()
+        ChoiceStats.objects.filter(exam_id__in=exam_ids).delete()
+        QuestionStats.objects.bulk_create(collector.question_rows(), batch_size=chunk_size)
+        ChoiceStats.objects.bulk_create(collector.choice_rows(), batch_size=chunk_size)
+    return len(collector.questions)
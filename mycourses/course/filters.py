@@ -1,8 +1,20 @@
-from django_filters.rest_framework import FilterSet
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils.translation import get_language
+from django_filters.rest_framework import CharFilter, FilterSet
+from rest_framework.filters import SearchFilter
+
+from . import search
+from .cache import get_version
 from .models import Course
 
 
 class CourseFilter(FilterSet):
+    # Фильтр и фасет по языку курса, а не по id строки CourseLanguages: у каждого курса свои строки
+    course_languages = CharFilter(field_name='course_languages__language', distinct=True)
+
     class Meta:
         model = Course
         fields = {
@@ -11,5 +23,58 @@ class CourseFilter(FilterSet):
             'teacher': ['exact'],
             'duration': ['exact'],
             'skills': ['exact'],
-            'course_languages': ['exact'],
-        }
\ No newline at end of file
+        }
+
+
+class CourseSearchFilter(SearchFilter):
+    # Полнотекстовый поиск через FTS5; на других СУБД — обычный SearchFilter по search_fields
+
+    def filter_queryset(self, request, queryset, view):
+        if not search.is_supported():
+            return super().filter_queryset(request, queryset, view)
+        text = request.query_params.get(self.search_param, '')
+        if not text.strip():
+            return queryset
+        rank = search.search_rank(text, get_language())
+        if rank is None:
+            return queryset.none()
+        return queryset.filter(pk__in=search.matching_ids(text)).annotate(search_rank=rank).order_by('search_rank', 'id')
+
+FACETS_CACHE_TIMEOUT = 300
+FACETS_IGNORED_PARAMS = ('cursor', 'page_size', 'facets')
+
+
+def facets_cache_key(params):
+    signature = '&'.join(
+        f'{key}={value}'
+        for key in sorted(params) if key not in FACETS_IGNORED_PARAMS
+        for value in sorted(params.getlist(key))
+    )
+    digest = hashlib.md5(f'{get_language()}|{signature}'.encode()).hexdigest()
+    return f'course_facets:{digest}:{get_version("catalog")}'
+
+
+def course_facets(params, queryset, filterset_class=CourseFilter):
+    # Для каждого поля фильтра считаются значения с учётом всех остальных фильтров (кроме самого поля),
+    # одним GROUP BY-запросом на поле
+    key = facets_cache_key(params)
+    facets = cache.get(key)
+    if facets is not None:
+        return facets
+
+    filterset = filterset_class(params, queryset=queryset)
+    if not filterset.is_valid():
+        return {}
+    values = filterset.form.cleaned_data
+    facets = {}
+    for name, facet_filter in filterset.filters.items():
+        filtered = queryset
+        for other_name, other_filter in filterset.filters.items():
+            if other_name != name:
+                filtered = other_filter.filter(filtered, values.get(other_name))
+        field = facet_filter.field_name
+        rows = (filtered.order_by().exclude(**{f'{field}__isnull': True})
+                .values(field).annotate(count=Count('pk', distinct=True)).order_by('-count', field))
+        facets[name] = [{'value': row[field], 'count': row['count']} for row in rows]
+    cache.set(key, facets, FACETS_CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,118 @@
+import operator
+from collections import defaultdict
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import AssignmentSubmission, ExamAttempt, GradebookEntry
+
+GRADEBOOK_BATCH_SIZE = 1000
+
+SubmissionStudents = AssignmentSubmission.students.through
+
+
+# Журнал хранит по строке на (курс, студент): за задание — лучшая оценка среди решений студента,
+# за экзамен — лучший балл среди попыток
+
+
+def new_change():
+    return {'assignments': {}, 'exams': {}}
+
+
+def apply_changes(changes):
+    # changes: {(id курса, id студента): {'assignments': {id: оценка или None}, 'exams': {id: балл}}}
+    if not changes:
+        return
+    students = defaultdict(list)
+    for course_id, student_id in changes:
+        students[course_id].append(student_id)
+    condition = reduce(operator.or_, (Q(course_id=course_id, student_id__in=ids) for course_id, ids in students.items()))
+    now = timezone.now()
+    with transaction.atomic():
+        entries = {(entry.course_id, entry.student_id): entry
+                   for entry in GradebookEntry.objects.select_for_update().filter(condition)}
+        missing = [key for key in changes if key not in entries]
+        if missing:
+            # Недостающие строки создаются пустыми; строку, которую одновременно создал другой запрос, INSERT
+            # пропускает, и изменения сливаются с ней после повторного чтения под блокировкой
+            GradebookEntry.objects.bulk_create(
+                [GradebookEntry(course_id=course_id, student_id=student_id) for course_id, student_id in missing],
+                ignore_conflicts=True,
+            )
+            condition = reduce(operator.or_, (Q(course_id=course_id, student_id=student_id)
+                                              for course_id, student_id in missing))
+            entries.update({(entry.course_id, entry.student_id): entry
+                            for entry in GradebookEntry.objects.select_for_update().filter(condition)})
+        for (course_id, student_id), change in changes.items():
+            entry = entries[(course_id, student_id)]
+            for assignment_id, grade in change['assignments'].items():
+                if grade is None:
+                    entry.assignment_grades.pop(str(assignment_id), None)
+                else:
+                    entry.assignment_grades[str(assignment_id)] = grade
+            for exam_id, score in change['exams'].items():
+                entry.exam_scores[str(exam_id)] = max(score, entry.exam_scores.get(str(exam_id), score))
+            entry.updated_at = now
+        GradebookEntry.objects.bulk_update(list(entries.values()), ['assignment_grades', 'exam_scores', 'updated_at'])
+
+
+def submission_pairs(submission_ids):
+    # {(id студента, id задания, id курса)} для решений
+    return set(SubmissionStudents.objects.filter(assignmentsubmission_id__in=submission_ids).values_list(
+        'userprofile_id', 'assignmentsubmission__assignment_id', 'assignmentsubmission__assignment__course_id',
+    ))
+
+
+def record_submission_grades(submission_ids):
+    record_pair_grades(submission_pairs(submission_ids))
+
+
+def record_pair_grades(pairs):
+    # Лучшая оценка пересчитывается одним GROUP BY по затронутым парам (студент, задание)
+    if not pairs:
+        return
+    grades = (SubmissionStudents.objects
+              .filter(userprofile_id__in={student_id for student_id, _, _ in pairs},
+                      assignmentsubmission__assignment_id__in={assignment_id for _, assignment_id, _ in pairs})
+              .values_list('userprofile_id', 'assignmentsubmission__assignment_id')
+              .annotate(grade=Max('assignmentsubmission__grade')).order_by())
+    grades = {(student_id, assignment_id): grade for student_id, assignment_id, grade in grades}
+    changes = defaultdict(new_change)
+    for student_id, assignment_id, course_id in pairs:
+        changes[(course_id, student_id)]['assignments'][assignment_id] = grades.get((student_id, assignment_id))
+    apply_changes(changes)
+
+
+def record_exam_scores(attempts):
+    changes = defaultdict(new_change)
+    for attempt in attempts:
+        exams = changes[(attempt.exam.course_id, attempt.student_id)]['exams']
+        exams[attempt.exam_id] = max(attempt.score, exams.get(attempt.exam_id, attempt.score))
+    apply_changes(changes)
+
+
+def rebuild_gradebook(course_id, batch_size=GRADEBOOK_BATCH_SIZE):
+    entries = {}
+
+    def entry(student_id):
+        if student_id not in entries:
+            entries[student_id] = GradebookEntry(course_id=course_id, student_id=student_id)
+        return entries[student_id]
+
+    grades = (SubmissionStudents.objects
+              .filter(assignmentsubmission__assignment__course_id=course_id, assignmentsubmission__grade__isnull=False)
+              .values_list('userprofile_id', 'assignmentsubmission__assignment_id')
+              .annotate(grade=Max('assignmentsubmission__grade')).order_by())
+    for student_id, assignment_id, grade in grades.iterator(chunk_size=batch_size):
+        entry(student_id).assignment_grades[str(assignment_id)] = grade
+    scores = (ExamAttempt.objects.filter(exam__course_id=course_id, score__isnull=False)
+              .values_list('student_id', 'exam_id').annotate(best=Max('score')).order_by())
+    for student_id, exam_id, score in scores.iterator(chunk_size=batch_size):
+        entry(student_id).exam_scores[str(exam_id)] = score
+
+    with transaction.atomic():
+        GradebookEntry.objects.filter(course_id=course_id).delete()
+        GradebookEntry.objects.bulk_create(entries.values(), batch_size=batch_size)
+    return len(entries)
@@ -0,0 +1,76 @@
+from django.core.cache import cache
+from rest_framework import serializers
+
+from .cache import get_version
+from .models import Question, UserAnswer
+
+ANSWER_KEY_TIMEOUT = 60 * 60
+
+
+def answer_key(exam_id):
+    # {id вопроса: {id варианта: правильный ли}} — строится одним запросом и живёт в кэше до изменения экзамена
+    key = f'exam_answer_key:{exam_id}:{get_version(f"exam:{exam_id}")}'
+    choices = cache.get(key)
+    if choices is None:
+        choices = {}
+        rows = Question.objects.filter(exam_id=exam_id).values_list('id', 'choices__id', 'choices__is_correct')
+        for question_id, choice_id, is_correct in rows:
+            question = choices.setdefault(question_id, {})
+            if choice_id is not None:
+                question[choice_id] = is_correct
+        cache.set(key, choices, ANSWER_KEY_TIMEOUT)
+    return choices
+
+
+def validate_answers(key, answers):
+    errors = {}
+    for question_id, choice_ids in answers.items():
+        if question_id not in key:
+            errors[str(question_id)] = ['Вопрос не относится к этому экзамену']
+            continue
+        unknown = choice_ids - key[question_id].keys()
+        if unknown:
+            errors[str(question_id)] = [f'Варианты {sorted(unknown)} не относятся к вопросу']
+    if errors:
+        raise serializers.ValidationError({'answers': errors})
+
+
+def correct_questions(key, answers):
+    # Вопрос засчитывается, только если выбраны ровно все правильные варианты
+    return {
+        question_id for question_id, choices in key.items()
+        if answers.get(question_id, set()) == {pk for pk, is_correct in choices.items() if is_correct}
+    }
+
+
+def score_answers(key, answers):
+    correct = len(correct_questions(key, answers))
+    total = len(key)
+    return correct, total, round(100 * correct / total) if total else 0
+
+
+def known_answers(key, answers):
+    # Черновик мог сохраниться до правки экзамена — оставляем только существующие вопросы и варианты
+    return {question_id: choice_ids & key[question_id].keys()
+            for question_id, choice_ids in answers.items() if question_id in key}
+
+
+def answer_rows(key, student_id, answers, attempt_id=None):
+    return [
+        UserAnswer(question_id=question_id, choice_id=choice_id, student_id=student_id, attempt_id=attempt_id,
+                   is_correct=key[question_id][choice_id])
+        for question_id, choice_ids in answers.items()
+        for choice_id in choice_ids
+    ]
+
+
+def exam_result(exam, key, answers):
+    correct, total, score = score_answers(key, answers)
+    return {
+        'exam': exam.pk,
+        'correct': correct,
+        'total': total,
+        'score': score,
+        'passing_score': exam.passing_score,
+        'passed': exam.passing_score is None or score >= exam.passing_score,
+    }
@@ -0,0 +1,58 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from course.models import Cart, Course
+from course.renderers import MessagePackRenderer, ORJSONRenderer, msgpack, orjson
+from course.serializers import CartSerializer, CourseStudentListSerializer
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость рендереров на данных каталога и корзин'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Сколько строк в каждом наборе данных')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def payload(self, queryset, serializer_class, rows):
+        request = APIRequestFactory().get('/')
+        request.query_params = request.GET
+        data = serializer_class(queryset[:rows], many=True, context={'request': request}).data
+        if not data:
+            return []
+        # Если в базе мало строк, набор дополняется копиями, чтобы размер ответа был заданным
+        return [data[i % len(data)] for i in range(rows)]
+
+    def handle(self, *args, rows, repeat, **options):
+        payloads = {
+            'catalog': self.payload(
+                Course.objects.select_related('category').prefetch_related('skills'),
+                CourseStudentListSerializer, rows,
+            ),
+            'cart': self.payload(
+                Cart.objects.select_related('student').prefetch_related(
+                    'items__course__category', 'items__course__skills'),
+                CartSerializer, rows,
+            ),
+        }
+        renderers = [('json (stdlib)', JSONRenderer())]
+        if orjson is not None:
+            renderers.append(('orjson', ORJSONRenderer()))
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+
+        for name, data in payloads.items():
+            if not data:
+                self.stdout.write(f'{name}: нет данных в базе, пропущено')
+                continue
+            self.stdout.write(f'{name}: {len(data)} строк')
+            baseline = None
+            for renderer_name, renderer in renderers:
+                size = len(renderer.render(data))
+                seconds = min(timeit.repeat(lambda: renderer.render(data), number=1, repeat=repeat))
+                baseline = baseline or seconds
+                self.stdout.write(
+                    f'  {renderer_name:<14} {seconds * 1000:8.2f} ms  {size / 1024:9.1f} KiB  x{baseline / seconds:.1f}'
+                )
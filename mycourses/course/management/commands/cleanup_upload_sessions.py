@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from course.models import UploadSession
+from course.uploads import remove_chunks
+
+
+class Command(BaseCommand):
+    help = 'Удаляет незавершённые загрузки старше --hours часов вместе с частями на диске'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24)
+
+    def handle(self, *args, **options):
+        stale = UploadSession.objects.filter(status=UploadSession.OPEN,
+                                             created_at__lt=timezone.now() - timedelta(hours=options['hours']))
+        removed = 0
+        for session in stale.iterator():
+            remove_chunks(session)
+            removed += 1
+        stale.delete()
+        self.stdout.write(self.style.SUCCESS(f'Удалено загрузок: {removed}'))
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from course.media_blobs import MEDIA_BLOB_BATCH_SIZE, collect_garbage, collect_orphan_files, recount_refs
+
+
+class Command(BaseCommand):
+    help = ('Удаляет blob-файлы, на которые не ссылается ни одна строка, и файлы без строки MediaBlob; '
+            'с --recount сначала пересчитывает ссылки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true')
+        parser.add_argument('--grace-hours', type=int, default=24)
+        parser.add_argument('--batch-size', type=int, default=MEDIA_BLOB_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self.stdout.write(f'Исправлено счётчиков: {recount_refs()}')
+        grace_period = timedelta(hours=options['grace_hours'])
+        removed, freed = collect_garbage(grace_period, options['batch_size'])
+        orphans, orphan_bytes = collect_orphan_files(grace_period, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено blob-файлов: {removed}, освобождено байт: {freed}; '
+                                             f'файлов без строки: {orphans}, байт: {orphan_bytes}'))
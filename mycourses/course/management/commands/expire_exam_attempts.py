@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from course.attempts import EXPIRE_BATCH_SIZE, expire_attempts
+
+
+class Command(BaseCommand):
+    help = 'Закрывает и проверяет попытки экзаменов, у которых вышло время (запускать по cron раз в минуту)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=EXPIRE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        expired = expire_attempts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Закрыто попыток: {expired}'))
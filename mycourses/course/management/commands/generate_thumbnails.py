@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from course.thumbnails import THUMBNAIL_FIELDS, generate_thumbnails, variants_field
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры для изображений, у которых их ещё нет (или с --force — для всех)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true')
+
+    def handle(self, *args, **options):
+        generated = 0
+        for model, field in THUMBNAIL_FIELDS.items():
+            rows = (model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).order_by('pk')
+                    .values_list('pk', field, variants_field(field)))
+            for pk, name, variants in rows.iterator():
+                if not options['force'] and (variants or {}).get('source') == name:
+                    continue
+                if generate_thumbnails(model, pk, field, name, variants) is not None:
+                    generated += 1
+        self.stdout.write(self.style.SUCCESS(f'Построено миниатюр: {generated}'))
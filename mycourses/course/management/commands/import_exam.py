@@ -0,0 +1,37 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+
+from course.exam_import import import_exam, read_exam_csv
+from course.models import Teacher
+
+
+class Command(BaseCommand):
+    help = 'Импортирует экзамен с вопросами и вариантами ответов из JSON или CSV одной транзакцией'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--teacher', required=True, help='username преподавателя')
+        parser.add_argument('--exam-name', help='для CSV')
+        parser.add_argument('--course', type=int, help='для CSV')
+        parser.add_argument('--duration', type=int, help='для CSV')
+        parser.add_argument('--passing-score', type=int, help='для CSV')
+
+    def handle(self, *args, **options):
+        try:
+            teacher = Teacher.objects.get(username=options['teacher'])
+        except Teacher.DoesNotExist:
+            raise CommandError(f'Преподаватель {options["teacher"]} не найден')
+
+        lines = None
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            if options['path'].lower().endswith('.csv'):
+                data, lines = read_exam_csv(stream, options)
+            else:
+                data = json.load(stream)
+        try:
+            exam = import_exam(data, teacher, lines)
+        except ValidationError as exc:
+            raise CommandError(json.dumps(exc.detail, ensure_ascii=False, indent=2))
+        self.stdout.write(self.style.SUCCESS(f'Импортирован экзамен {exam.pk}: вопросов {exam.questions.count()}'))
@@ -0,0 +1,38 @@
+import os
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.management.base import BaseCommand
+
+from course.media_blobs import MEDIA_BLOB_FIELDS, blob_files
+from course.storage import BLOB_ROOT, is_blob_name
+
+
+class Command(BaseCommand):
+    help = ('Переносит из MEDIA_ROOT в PROTECTED_MEDIA_ROOT файлы защищённых полей и blob\'ы, '
+            'сохранённые до появления PROTECTED_MEDIA_ROOT')
+
+    def handle(self, *args, **options):
+        moved = 0
+        for model, fields in MEDIA_BLOB_FIELDS.items():
+            for field in fields:
+                names = (model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                         .values_list(field, flat=True).distinct())
+                for name in names.iterator():
+                    if not is_blob_name(name):  # blob'ы переносятся ниже целым каталогом
+                        moved += self.move(name)
+        # Каталог blob'ов переносится полностью, вместе с файлами, на которые уже никто не ссылается, —
+        # иначе collect_media_blobs не нашёл бы их в новом месте
+        root = os.path.join(settings.MEDIA_ROOT, BLOB_ROOT)
+        for path in blob_files(root):
+            moved += self.move(os.path.relpath(path, settings.MEDIA_ROOT))
+        self.stdout.write(self.style.SUCCESS(f'Перенесено файлов: {moved}'))
+
+    def move(self, name):
+        source = os.path.join(settings.MEDIA_ROOT, name)
+        target = os.path.join(settings.PROTECTED_MEDIA_ROOT, name)
+        if not os.path.isfile(source) or os.path.exists(target):
+            return 0
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        file_move_safe(source, target)
+        return 1
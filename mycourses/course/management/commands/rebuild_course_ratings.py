@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+
+from course.models import Course, Review
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает агрегаты отзывов (количество, сумма звёзд, средний рейтинг, гистограмма) для всех курсов'
+
+    def handle(self, *args, **options):
+        reviews = Review.objects.filter(course=OuterRef('pk')).order_by().values('course')
+        count = reviews.annotate(value=Count('id')).values('value')
+        stars = reviews.annotate(value=Sum('stars')).values('value')
+        histogram = {
+            f'stars_{value}': Coalesce(Subquery(
+                reviews.filter(stars=value).annotate(value=Count('id')).values('value'), output_field=IntegerField()
+            ), Value(0))
+            for value in range(1, 6)
+        }
+
+        with transaction.atomic():
+            Course.objects.update(
+                review_count=Coalesce(Subquery(count, output_field=IntegerField()), Value(0)),
+                review_stars_sum=Coalesce(Subquery(stars, output_field=IntegerField()), Value(0)),
+                **histogram,
+            )
+            updated = Course.objects.update(
+                avg_rating=Case(
+                    When(review_count__gt=0,
+                         then=Round(Cast(F('review_stars_sum'), FloatField()) / Cast(F('review_count'), FloatField()), 1)),
+                    default=0.0,
+                    output_field=FloatField(),
+                )
+            )
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано курсов: {updated}'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from course.exam_stats import rebuild_exam_stats
+from course.models import Exam
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает статистику вопросов и вариантов ответов по закрытым попыткам экзаменов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_ids', nargs='*', type=int, help='id экзаменов; по умолчанию все')
+
+    def handle(self, *args, **options):
+        exam_ids = options['exam_ids'] or Exam.objects.order_by('pk').values_list('pk', flat=True)
+        questions = 0
+        for exam_id in exam_ids:
+            questions += rebuild_exam_stats([exam_id])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано вопросов: {questions}'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from course.gradebook import rebuild_gradebook
+from course.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает журнал оценок курсов по оценкам за задания и попыткам экзаменов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int, help='id курсов; по умолчанию все')
+
+    def handle(self, *args, **options):
+        course_ids = options['course_ids'] or Course.objects.order_by('pk').values_list('pk', flat=True)
+        entries = 0
+        for course_id in course_ids:
+            entries += rebuild_gradebook(course_id)
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано строк журнала: {entries}'))
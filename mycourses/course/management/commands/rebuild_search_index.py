@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from course import search
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс курсов (SQLite FTS5)'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError('Полнотекстовый индекс поддерживается только для SQLite')
+        with transaction.atomic():
+            search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен'))
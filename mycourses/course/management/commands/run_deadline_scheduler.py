@@ -0,0 +1,27 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from course.deadlines import DEADLINE_BATCH_SIZE, close_overdue, send_reminders
+
+
+class Command(BaseCommand):
+    help = 'Напоминает о сроках сдачи заданий и закрывает просроченные; без --once работает в цикле'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='один проход и выход (для cron)')
+        parser.add_argument('--interval', type=int, default=60, help='секунд между проходами')
+        parser.add_argument('--window-hours', type=int, default=24, help='за сколько часов до срока напоминать')
+        parser.add_argument('--batch-size', type=int, default=DEADLINE_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        window = timedelta(hours=options['window_hours'])
+        while True:
+            reminded = send_reminders(window=window, batch_size=options['batch_size'])
+            closed = close_overdue(batch_size=options['batch_size'])
+            self.stdout.write(f'Напоминания: заданий {reminded[0]}, уведомлений {reminded[1]}; '
+                              f'закрыто: заданий {closed[0]}, уведомлений {closed[1]}')
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,177 @@
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import AssignmentSubmission, Certificate, CourseLanguages, Lesson, MediaBlob
+from .storage import BLOB_ROOT, blob_storage, is_blob_name
+
+# поля, которые хранятся в blob_storage
+MEDIA_BLOB_FIELDS = {
+    Lesson: ('video_file',),
+    CourseLanguages: ('video_filed',),
+    Certificate: ('certificate_file',),
+    AssignmentSubmission: ('submission_file',),
+}
+MEDIA_BLOB_GRACE_PERIOD = timedelta(hours=24)  # blob мог быть только что записан, а строка ещё не сохранена
+MEDIA_BLOB_BATCH_SIZE = 500
+
+
+def field_name(instance, field):
+    # Отложенные (.only/.defer) поля не читаются, чтобы не делать лишний запрос
+    value = instance.__dict__.get(field)
+    return getattr(value, 'name', value) or ''
+
+
+def saved_fields(instance, update_fields=None):
+    # Поля, которые попадут в UPDATE: загруженные и, если задан update_fields, перечисленные в нём
+    return [field for field in MEDIA_BLOB_FIELDS[type(instance)]
+            if field in instance.__dict__ and (update_fields is None or field in update_fields)]
+
+
+def stored_names(instance, fields):
+    if not fields or instance.pk is None or instance._state.adding:
+        return {}
+    row = type(instance)._base_manager.filter(pk=instance.pk).values_list(*fields).first()
+    return {field: name or '' for field, name in zip(fields, row)} if row else {}
+
+
+def remember_names(instance, update_fields=None):
+    # pre_save: прежние имена читаются одним запросом и только у существующей строки, чьи файловые поля сохраняются
+    instance._blob_names = stored_names(instance, saved_fields(instance, update_fields))
+
+
+def remember_deleted_names(instance):
+    # pre_delete: имена берутся из загруженной строки, запрос — только за отложенными (.only/.defer) полями
+    fields = MEDIA_BLOB_FIELDS[type(instance)]
+    names = {field: field_name(instance, field) for field in fields if field in instance.__dict__}
+    names.update(stored_names(instance, [field for field in fields if field not in names]))
+    instance._blob_names = names
+
+
+def change_refs(deltas):
+    deltas = {name: delta for name, delta in deltas.items() if is_blob_name(name) and delta}
+    if deltas:
+        MediaBlob.objects.filter(name__in=deltas).update(ref_count=F('ref_count') + Case(
+            *(When(name=name, then=Value(delta)) for name, delta in deltas.items()), default=Value(0),
+        ))
+
+
+def set_refs(counts):
+    if counts:
+        MediaBlob.objects.filter(name__in=counts).update(ref_count=Case(
+            *(When(name=name, then=Value(count)) for name, count in counts.items()), default=F('ref_count'),
+        ))
+
+
+def track_saved(instance, update_fields=None):
+    previous = getattr(instance, '_blob_names', {})
+    deltas = Counter()
+    for field in saved_fields(instance, update_fields):
+        name = field_name(instance, field)
+        old = previous.get(field)
+        if name != old:
+            deltas[name] += 1
+            if old is not None:  # None — строки ещё не было
+                deltas[old] -= 1
+    change_refs(deltas)
+
+
+def track_deleted(instance):
+    deltas = Counter()
+    for name in getattr(instance, '_blob_names', {}).values():
+        deltas[name] -= 1
+    change_refs(deltas)
+
+
+def referenced_counts(names=None):
+    counts = Counter()
+    for model, fields in MEDIA_BLOB_FIELDS.items():
+        for field in fields:
+            rows = model.objects.filter(**{f'{field}__startswith': f'{BLOB_ROOT}/'})
+            if names is not None:
+                rows = rows.filter(**{f'{field}__in': names})
+            counts.update(rows.values_list(field, flat=True).iterator())
+    return counts
+
+
+def recount_refs():
+    # Пересчёт ссылок по строкам; нужен после bulk-операций и update(), мимо которых сигналы не проходят
+    counts = referenced_counts()
+    changed = {name: counts.get(name, 0) for name, ref_count in MediaBlob.objects.values_list('name', 'ref_count')
+               .iterator() if ref_count != counts.get(name, 0)}
+    names = list(changed)
+    for start in range(0, len(names), MEDIA_BLOB_BATCH_SIZE):
+        set_refs({name: changed[name] for name in names[start:start + MEDIA_BLOB_BATCH_SIZE]})
+    return len(changed)
+
+
+def collect_garbage(grace_period=MEDIA_BLOB_GRACE_PERIOD, batch_size=MEDIA_BLOB_BATCH_SIZE):
+    # Удаляет blob'ы без ссылок; перед удалением ссылки перепроверяются по самим строкам. Строки кандидатов
+    # блокируются (занятые сохранением пропускаются), удаление условное — файл стирается, только если строку
+    # действительно удалили, и ещё под блокировкой, чтобы параллельный _save увидел, что файл нужно записать заново
+    cutoff = timezone.now() - grace_period
+    removed, freed, last_id = 0, 0, 0
+    while True:
+        with transaction.atomic():
+            batch = list(MediaBlob.objects.select_for_update(skip_locked=True)
+                         .filter(ref_count__lte=0, stored_at__lt=cutoff, pk__gt=last_id)
+                         .order_by('pk').only('id', 'name', 'size')[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].pk
+            referenced = referenced_counts([blob.name for blob in batch])
+            set_refs(referenced)
+            for blob in batch:
+                if referenced.get(blob.name):
+                    continue
+                if MediaBlob.objects.filter(pk=blob.pk, ref_count__lte=0, stored_at__lt=cutoff).delete()[0]:
+                    blob_storage.delete_blob(blob.name)
+                    removed += 1
+                    freed += blob.size
+        if len(batch) < batch_size:
+            break
+    return removed, freed
+
+
+def blob_files(root):
+    for directory, _, files in os.walk(root):
+        for file in files:
+            yield os.path.join(directory, file)
+
+
+def collect_orphan_files(grace_period=MEDIA_BLOB_GRACE_PERIOD, batch_size=MEDIA_BLOB_BATCH_SIZE):
+    # Файлы blob'ов без строки MediaBlob: транзакция, в которой их сохраняли, откатилась, или оборвалась запись
+    # во временный файл. Недавно изменённые не трогаются — их строка может быть ещё не закоммичена
+    root = blob_storage.path(BLOB_ROOT)
+    cutoff = (timezone.now() - grace_period).timestamp()
+    removed, freed = 0, 0
+
+    def remove(paths):
+        nonlocal removed, freed
+        names = {os.path.relpath(path, blob_storage.location).replace(os.sep, '/'): path for path in paths}
+        known = set(MediaBlob.objects.filter(name__in=names).values_list('name', flat=True))
+        for name, path in names.items():
+            if name in known:
+                continue
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime >= cutoff:
+                    continue
+                os.unlink(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+            freed += stat.st_size
+
+    batch = []
+    for path in blob_files(root):
+        batch.append(path)
+        if len(batch) == batch_size:
+            remove(batch)
+            batch = []
+    remove(batch)
+    return removed, freed
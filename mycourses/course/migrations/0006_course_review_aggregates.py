@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:32
+
+from django.db import migrations, models
+
+
+def fill_review_aggregates(apps, schema_editor):
+    Course = apps.get_model('course', 'Course')
+    for course in Course.objects.all():
+        stars = [review.stars or 0 for review in course.reviews.all()]
+        course.review_count = len(stars)
+        course.review_stars_sum = sum(stars)
+        course.avg_rating = round(sum(stars) / len(stars), 1) if stars else 0
+        course.save(update_fields=['review_count', 'review_stars_sum', 'avg_rating'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0005_remove_favorite_user_remove_favoritelesson_cart_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='avg_rating',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='review_stars_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_review_aggregates, migrations.RunPython.noop),
+    ]
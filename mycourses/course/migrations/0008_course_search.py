@@ -0,0 +1,38 @@
+from django.db import migrations
+
+SEARCH_COLUMNS = ('course_name_en', 'course_name_ru', 'description_en', 'description_ru', 'skills', 'category')
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Course = apps.get_model('course', 'Course')
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS course_search USING fts5("
+        f"{', '.join(SEARCH_COLUMNS)}, tokenize = 'porter unicode61 remove_diacritics 2')"
+    )
+    for course in Course.objects.select_related('category').prefetch_related('skills'):
+        skills = ' '.join(filter(None, (value for skill in course.skills.all()
+                                        for value in (skill.skills_en, skill.skills_ru))))
+        category = ' '.join(filter(None, (course.category.category_name_en, course.category.category_name_ru)))
+        schema_editor.execute(
+            f"INSERT INTO course_search (rowid, {', '.join(SEARCH_COLUMNS)}) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            [course.pk, course.course_name_en or course.course_name, course.course_name_ru or '',
+             course.description_en or course.description, course.description_ru or '', skills, category],
+        )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS course_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0007_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:39
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_rating_histogram(apps, schema_editor):
+    Course = apps.get_model('course', 'Course')
+    Review = apps.get_model('course', 'Review')
+    rows = Review.objects.filter(stars__isnull=False).values('course', 'stars').annotate(total=Count('id')).order_by()
+    for row in rows:
+        Course.objects.filter(pk=row['course']).update(**{f"stars_{row['stars']}": row['total']})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0008_course_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='stars_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='stars_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='stars_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='stars_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='stars_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['course', 'created_at', 'id'], name='review_course_created_idx'),
+        ),
+        migrations.RunPython(fill_rating_histogram, migrations.RunPython.noop),
+    ]
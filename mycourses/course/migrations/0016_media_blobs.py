@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:05
+
+import course.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0015_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='assignmentsubmission',
+            name='submission_file',
+            field=models.FileField(blank=True, null=True, storage=course.storage.DedupFileSystemStorage(), upload_to='submissions/'),
+        ),
+        migrations.AlterField(
+            model_name='certificate',
+            name='certificate_file',
+            field=models.FileField(blank=True, null=True, storage=course.storage.DedupFileSystemStorage(), upload_to=''),
+        ),
+        migrations.AlterField(
+            model_name='courselanguages',
+            name='video_filed',
+            field=models.FileField(blank=True, null=True, storage=course.storage.DedupFileSystemStorage(), upload_to='course_languages_video/'),
+        ),
+        migrations.AlterField(
+            model_name='lesson',
+            name='video_file',
+            field=models.FileField(blank=True, null=True, storage=course.storage.DedupFileSystemStorage(), upload_to=''),
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('digest', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.IntegerField(default=0)),
+                ('stored_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ref_count', 'stored_at'], name='blob_unreferenced_idx')],
+            },
+        ),
+    ]
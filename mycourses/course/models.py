@@ -1,6 +1,13 @@
-from django.db import models
+import math
+import uuid
+
+from django.db import models, transaction
+from django.db.models import Case, F, FloatField, When
+from django.db.models.functions import Cast, Round
 from django.contrib.auth.models import AbstractUser
 
+from .storage import blob_storage
+
 
 class UserProfile(AbstractUser):
     pass
@@ -11,6 +18,7 @@ class UserProfile(AbstractUser):
 
 class Teacher(UserProfile):
     profile_picture = models.ImageField(upload_to='profile_picture/', null=True, blank=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)  # см. thumbnails.py
     bio = models.TextField(null=True, blank=True)
     expertise = models.CharField(max_length=255, verbose_name="Основная область знаний преподавателя")
     years_of_experience = models.PositiveIntegerField(default=0, verbose_name="Опыт работы в годах")
@@ -23,6 +31,7 @@ class Teacher(UserProfile):
 
 class Student(UserProfile):
     student_images = models.ImageField(upload_to='student_images/', null=True, blank=True)
+    student_images_variants = models.JSONField(default=dict, blank=True, editable=False)  # см. thumbnails.py
     bio_student = models.TextField(null=True, blank=True)
     grade_level = models.CharField(
         max_length=50,
@@ -76,6 +85,7 @@ class Course(models.Model):
     created_at = models.DateField(auto_now=True)
     updated_at = models.DateField(auto_now=True)
     course_images = models.ImageField(upload_to='course_images/', null=True, blank=True )
+    course_images_variants = models.JSONField(default=dict, blank=True, editable=False)  # см. thumbnails.py
     DURATION_CHOICES = (
         ('Менее 2 часов', 'Менее 2 часов'),
         ('1–4 недели', '1–4 недели'),
@@ -84,30 +94,57 @@ class Course(models.Model):
 
     )
     duration = models.CharField(max_length=40, choices=DURATION_CHOICES)
+    # Агрегаты по отзывам, обновляются при каждом изменении Review
+    review_count = models.PositiveIntegerField(default=0)
+    review_stars_sum = models.PositiveIntegerField(default=0)
+    avg_rating = models.FloatField(default=0)
+    # Гистограмма оценок 1–5
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.course_name
 
-
     def get_avg_rating(self):
-        ratings = self.reviews.all()
-        if ratings.exists():
-            return round(sum(i.stars for i in ratings) / ratings.count(), 1)
-        return 0
+        return self.avg_rating
 
     def get_total_people(self):
-        ratings = self.reviews.all()
-        if ratings.exists():
-            if ratings.count() > 10000:
-                return '10000+'
-            return ratings.count()
-        return 0
+        if self.review_count > 10000:
+            return '10000+'
+        return self.review_count
+
+    def get_rating_histogram(self):
+        return {stars: getattr(self, f'stars_{stars}') for stars in range(1, 6)}
+
+    @classmethod
+    def update_rating(cls, course_id, stars, delta=1):
+        # delta=1 — отзыв добавлен, delta=-1 — удалён.
+        # В UPDATE правые части видят старые значения колонок, поэтому среднее считается от новых сумм явно
+        count_delta = delta
+        stars_delta = (stars or 0) * delta
+        new_count = F('review_count') + count_delta
+        new_sum = F('review_stars_sum') + stars_delta
+        histogram = {f'stars_{stars}': F(f'stars_{stars}') + delta} if stars else {}
+        cls.objects.filter(pk=course_id).update(
+            **histogram,
+            review_count=new_count,
+            review_stars_sum=new_sum,
+            avg_rating=Case(
+                When(review_count__gt=-count_delta,
+                     then=Round(Cast(new_sum, FloatField()) / Cast(new_count, FloatField()), 1)),
+                default=0.0,
+                output_field=FloatField(),
+            ),
+        )
 
 
 class CourseLanguages(models.Model):
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='course_languages')
     language = models.CharField(max_length=35)
-    video_filed = models.FileField(upload_to='course_languages_video/', null=True, blank=True)
+    video_filed = models.FileField(upload_to='course_languages_video/', null=True, blank=True, storage=blob_storage)
     video_url = models.URLField(null=True, blank=True)
     course = models.ForeignKey(Course, related_name='course_languages', on_delete=models.CASCADE)
 
@@ -119,7 +156,7 @@ class Lesson(models.Model):
     teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='lesson')
     lesson_name = models.CharField(max_length=255)
     video_url = models.URLField(blank=True, null=True)
-    video_file = models.FileField(blank=True, null=True)
+    video_file = models.FileField(blank=True, null=True, storage=blob_storage)
     content = models.TextField()
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='lessons')
 
@@ -134,6 +171,13 @@ class Assignment(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='assignments')
     description = models.TextField()
     due_date = models.DateTimeField()
+    is_closed = models.BooleanField(default=False)  # после due_date решения не принимаются (deadlines.py)
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_closed', 'due_date'], name='assignment_open_due_idx'),
+        ]
 
     def __str__(self):
         return self.assignment_name
@@ -142,11 +186,16 @@ class Assignment(models.Model):
 class AssignmentSubmission(models.Model):
     students = models.ManyToManyField(UserProfile, related_name='submissions')
     assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, related_name='submissions')
-    submission_file = models.FileField(upload_to='submissions/', blank=True, null=True)
+    submission_file = models.FileField(upload_to='submissions/', blank=True, null=True, storage=blob_storage)
     submitted_at = models.DateTimeField(auto_now_add=True)
     grade = models.PositiveSmallIntegerField(choices=[(i, str(i)) for i in range(1, 101)], null=True, blank=True,
                                              verbose_name='Оценка на задачи')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['submitted_at', 'id'], name='submission_submitted_idx'),
+        ]
+
     def __str__(self):
         return f'{self.submission_file}'
 
@@ -181,10 +230,76 @@ class Choice(models.Model):  # Ответ
         return self.text
 
 
+class ExamAttempt(models.Model):
+    IN_PROGRESS, SUBMITTED, EXPIRED = 'in_progress', 'submitted', 'expired'
+    STATUS_CHOICES = (
+        (IN_PROGRESS, 'Идёт'),
+        (SUBMITTED, 'Сдан'),
+        (EXPIRED, 'Время истекло'),
+    )
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='exam_attempts')
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='attempts')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=IN_PROGRESS)
+    started_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()  # started_at + Exam.duration минут
+    saved_at = models.DateTimeField(null=True, blank=True)  # последний сброс черновика ответов в БД
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    answers = models.JSONField(default=dict, blank=True)  # {id вопроса: [id вариантов]}
+    score = models.PositiveSmallIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'exam', 'status'], name='attempt_student_exam_idx'),
+            models.Index(fields=['status', 'expires_at'], name='attempt_status_expires_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'exam'], condition=models.Q(status='in_progress'),
+                                    name='attempt_one_active'),
+        ]
+
+    def __str__(self):
+        return f'{self.student} - {self.exam} ({self.status})'
+
+
+class QuestionStats(models.Model):
+    # Статистика для анализа заданий; копится при проверке попыток (exam_stats.record_attempts),
+    # пересчитывается командой rebuild_exam_stats
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='question_stats')
+    attempts = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    score_sum = models.BigIntegerField(default=0)  # сумма баллов за экзамен по всем попыткам
+    score_squares_sum = models.BigIntegerField(default=0)
+    correct_score_sum = models.BigIntegerField(default=0)  # сумма баллов попыток, где вопрос решён верно
+
+    def get_difficulty(self):
+        # Доля верных ответов: чем меньше, тем сложнее вопрос
+        return round(self.correct / self.attempts, 3) if self.attempts else None
+
+    def get_discrimination(self):
+        # Точечно-бисериальная корреляция верного ответа на вопрос с баллом за экзамен
+        if self.attempts < 2 or self.correct in (0, self.attempts):
+            return None
+        mean = self.score_sum / self.attempts
+        variance = self.score_squares_sum / self.attempts - mean ** 2
+        if variance <= 0:
+            return None
+        p = self.correct / self.attempts
+        correct_mean = self.correct_score_sum / self.correct
+        return round((correct_mean - mean) / math.sqrt(variance) * math.sqrt(p / (1 - p)), 3)
+
+
+class ChoiceStats(models.Model):
+    choice = models.OneToOneField(Choice, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='choice_stats')
+    picks = models.PositiveIntegerField(default=0)
+
+
 class UserAnswer(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)  # Выбранный пользователем ответ
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    attempt = models.ForeignKey(ExamAttempt, on_delete=models.CASCADE, null=True, blank=True, related_name='user_answers')
     is_correct = models.BooleanField(default=False)  # Результат проверки (правильно/неправильно)
 
     def __str__(self):
@@ -198,12 +313,115 @@ class StudentAnswer(models.Model):
     selected_options = models.ManyToManyField(UserAnswer)  # Для выборочных вопросов
 
 
+class GradebookEntry(models.Model):
+    # Строка журнала курса: оценки студента за задания и лучшие баллы за экзамены. Обновляется при выставлении
+    # оценок и проверке попыток (gradebook.py), пересчитывается командой rebuild_gradebook
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='gradebook')
+    student = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='gradebook_entries')
+    assignment_grades = models.JSONField(default=dict, blank=True)  # {id задания: оценка}
+    exam_scores = models.JSONField(default=dict, blank=True)  # {id экзамена: лучший балл}
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'student'], name='gradebook_course_student'),
+        ]
+
+    def __str__(self):
+        return f'{self.course} - {self.student}'
+
+
+class Notification(models.Model):
+    DEADLINE_REMINDER, ASSIGNMENT_CLOSED = 'deadline_reminder', 'assignment_closed'
+    KIND_CHOICES = (
+        (DEADLINE_REMINDER, 'Скоро срок сдачи'),
+        (ASSIGNMENT_CLOSED, 'Приём решений закрыт'),
+    )
+    recipient = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='notifications')
+    assignment = models.ForeignKey(Assignment, on_delete=models.CASCADE, null=True, blank=True,
+                                   related_name='notifications')
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES)
+    message = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', 'created_at', 'id'], name='notification_recipient_idx'),
+        ]
+        constraints = [
+            # повторный проход планировщика не создаёт дублей
+            models.UniqueConstraint(fields=['recipient', 'assignment', 'kind'], name='notification_once'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipient} - {self.kind}'
+
+
+class UploadSession(models.Model):
+    # Загрузка файла по частям: части лежат на диске в UPLOAD_CHUNKS_ROOT/<id>/, в БД пишется только начало и конец
+    TARGET_CHOICES = (
+        ('submission', 'Файл решения задания'),
+        ('lesson_video', 'Видео урока'),
+        ('course_language_video', 'Видео курса'),
+    )
+    OPEN, COMPLETE = 'open', 'complete'
+    STATUS_CHOICES = (
+        (OPEN, 'Загружается'),
+        (COMPLETE, 'Загружен'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='upload_sessions')
+    target = models.CharField(max_length=32, choices=TARGET_CHOICES)
+    object_id = models.PositiveIntegerField()
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=OPEN)
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='upload_status_created_idx'),
+        ]
+
+    def get_chunk_count(self):
+        return max(math.ceil(self.size / self.chunk_size), 1)
+
+    def get_chunk_length(self, number):
+        if number == self.get_chunk_count():
+            return self.size - (number - 1) * self.chunk_size
+        return self.chunk_size
+
+    def __str__(self):
+        return f'{self.filename} ({self.status})'
+
+
+class MediaBlob(models.Model):
+    # Файл в blob_storage (см. storage.py); ref_count — сколько FileField ссылаются на него
+    name = models.CharField(max_length=100, unique=True)
+    digest = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    stored_at = models.DateTimeField()  # последнее сохранение — недавно записанные blob'ы сборщик не трогает
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'stored_at'], name='blob_unreferenced_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
 class Certificate(models.Model):
     student = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='certificate_student')
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='certificate_course')
     issued_at = models.DateTimeField(auto_now_add=True)
     certificate_url = models.URLField(null=True, blank=True)
-    certificate_file = models.FileField(null=True, blank=True)
+    certificate_file = models.FileField(null=True, blank=True, storage=blob_storage)
 
     def __str__(self):
         return self.certificate_url
@@ -217,9 +435,27 @@ class Review(models.Model):
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='review_created_idx'),
+            models.Index(fields=['course', 'created_at', 'id'], name='review_course_created_idx'),
+        ]
+
     def __str__(self):
         return f'{self.stars} - {self.student.username}'
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = Review.objects.select_for_update().filter(pk=self.pk).values('course_id', 'stars').first()
+            # прежний курс нужен и сигналу post_save (сброс кэша каталога) — второй раз строку не читаем
+            self._previous_course_id = previous['course_id'] if previous else None
+            super().save(*args, **kwargs)
+            if previous:
+                Course.update_rating(previous['course_id'], previous['stars'], -1)
+            Course.update_rating(self.course_id, self.stars)
+
 
 class Cart(models.Model):
     student = models.OneToOneField(Student, related_name='cart', on_delete=models.CASCADE)
@@ -266,6 +502,11 @@ class Order(models.Model):
     country = models.ForeignKey(Country, on_delete=models.CASCADE)
     creates_date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['student', 'creates_date', 'id'], name='order_student_created_idx'),
+        ]
+
     def __str__(self):
         return f'{self.student} - {self.status}'
 
@@ -0,0 +1,38 @@
+from rest_framework.pagination import CursorPagination
+
+
+class DefaultCursorPagination(CursorPagination):
+    # Курсорная пагинация: страница ищется по индексу, без OFFSET
+    ordering = '-id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class ReviewCursorPagination(DefaultCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class OrderCursorPagination(DefaultCursorPagination):
+    ordering = ('-creates_date', '-id')
+
+
+class SubmissionCursorPagination(DefaultCursorPagination):
+    ordering = ('-submitted_at', '-id')
+
+
+class NotificationCursorPagination(DefaultCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class GradebookCursorPagination(DefaultCursorPagination):
+    ordering = ('student_id',)
+
+
+class CourseCursorPagination(DefaultCursorPagination):
+
+    def get_ordering(self, request, queryset, view):
+        # Результаты поиска листаются в порядке релевантности
+        if 'search_rank' in queryset.query.annotations:
+            return ('search_rank', 'id')
+        return super().get_ordering(request, queryset, view)
@@ -13,4 +13,13 @@ class UpdateCourse(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user == obj.teacher:
             return True
-        return False
\ No newline at end of file
+        return False
+
+class IsStudent(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and hasattr(request.user, 'student'))
+
+
+class IsTeacher(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and hasattr(request.user, 'teacher'))
@@ -0,0 +1,105 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import Course
+
+SEARCH_TABLE = 'course_search'
+SEARCH_COLUMNS = ('course_name_en', 'course_name_ru', 'description_en', 'description_ru', 'skills', 'category')
+
+# Веса колонок для bm25: название на активном языке важнее всего, описание на другом языке — меньше всего
+NAME_WEIGHT, OTHER_NAME_WEIGHT = 10.0, 5.0
+DESCRIPTION_WEIGHT, OTHER_DESCRIPTION_WEIGHT = 2.0, 1.0
+SKILLS_WEIGHT, CATEGORY_WEIGHT = 3.0, 2.0
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def course_document(course):
+    skills = ' '.join(filter(None, (value for skill in course.skills.all()
+                                    for value in (skill.skills_en, skill.skills_ru))))
+    category = ' '.join(filter(None, (course.category.category_name_en, course.category.category_name_ru)))
+    return (course.course_name_en or course.course_name, course.course_name_ru or '',
+            course.description_en or course.description, course.description_ru or '', skills, category)
+
+
+def index_courses(course_ids):
+    course_ids = list(course_ids)
+    if not course_ids or not is_supported():
+        return
+    courses = Course.objects.filter(pk__in=course_ids).select_related('category').prefetch_related('skills')
+    with connection.cursor() as cursor:
+        remove_courses(course_ids, cursor=cursor)
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, {', '.join(SEARCH_COLUMNS)}) VALUES (%s{', %s' * len(SEARCH_COLUMNS)})",
+            [(course.pk, *course_document(course)) for course in courses],
+        )
+
+
+def remove_courses(course_ids, cursor=None):
+    course_ids = list(course_ids)
+    if not course_ids or not is_supported():
+        return
+    if cursor is None:
+        with connection.cursor() as cursor:
+            return remove_courses(course_ids, cursor=cursor)
+    cursor.execute(
+        f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(course_ids))})", course_ids,
+    )
+
+
+def rebuild_index(batch_size=1000):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+    ids = Course.objects.order_by('pk').values_list('pk', flat=True)
+    batch = []
+    for pk in ids.iterator(chunk_size=batch_size):
+        batch.append(pk)
+        if len(batch) == batch_size:
+            index_courses(batch)
+            batch = []
+    index_courses(batch)
+
+
+def build_match_query(text):
+    # Каждое слово ищется как префикс; слова в кавычках, чтобы операторы FTS5 из ввода не выполнялись
+    tokens = TOKEN_RE.findall(text)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def column_weights(language):
+    primary, other = ('ru', 'en') if language and language.startswith('ru') else ('en', 'ru')
+    weights = {
+        f'course_name_{primary}': NAME_WEIGHT,
+        f'course_name_{other}': OTHER_NAME_WEIGHT,
+        f'description_{primary}': DESCRIPTION_WEIGHT,
+        f'description_{other}': OTHER_DESCRIPTION_WEIGHT,
+        'skills': SKILLS_WEIGHT,
+        'category': CATEGORY_WEIGHT,
+    }
+    return [weights[column] for column in SEARCH_COLUMNS]
+
+
+def search_rank(text, language=None):
+    # bm25 курса прямо из FTS-таблицы (меньше — релевантнее); результаты не обрезаются, курсорная пагинация
+    # идёт по (search_rank, id). None — в запросе нет ни одного слова
+    match = build_match_query(text)
+    if not match:
+        return None
+    weights = ', '.join(str(weight) for weight in column_weights(language or settings.LANGUAGE_CODE))
+    return RawSQL(
+        f'SELECT bm25({SEARCH_TABLE}, {weights}) FROM {SEARCH_TABLE} '
+        f'WHERE {SEARCH_TABLE} MATCH %s AND {SEARCH_TABLE}.rowid = {Course._meta.db_table}.id',
+        [match], output_field=FloatField(),
+    )
+
+
+def matching_ids(text):
+    return RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [build_match_query(text)])
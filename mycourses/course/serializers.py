@@ -1,12 +1,147 @@
+import os
+
 from rest_framework import serializers
 from .models import *
 
 
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from .thumbnails import THUMBNAIL_SIZES, variants_field
+from .uploads import (UPLOAD_DEFAULT_CHUNK_SIZE, UPLOAD_MAX_CHUNK_SIZE, UPLOAD_MAX_SIZE, UPLOAD_MIN_CHUNK_SIZE,
+                      received_chunks, target_queryset)
+from rest_framework.permissions import SAFE_METHODS
+
+
+def query_param_set(request, name):
+    value = request.query_params.get(name) if request is not None else None
+    if value is None:
+        return None
+    return {item.strip() for item in value.split(',') if item.strip()}
+
+
+def path_prefixes(path):
+    parts = path.split('.')
+    return {'.'.join(parts[:i]) for i in range(1, len(parts) + 1)}
+
+
+def field_is_requested(request, path):
+    # ?fields=course_name,category.category_name — поле нужно, если указано оно само, его предок или потомок
+    requested = query_param_set(request, 'fields')
+    if not requested:
+        return True
+    return any(item == path or item.startswith(f'{path}.') or path.startswith(f'{item}.') for item in requested)
+
+
+def field_is_expanded(request, path):
+    # ?expand=course,course.category — вложенный объект, не указанный в expand, отдаётся как id
+    expanded = query_param_set(request, 'expand')
+    if expanded is None:
+        return True
+    return path_prefixes(path) <= {prefix for item in expanded for prefix in path_prefixes(item)}
+
+
+LIST_THUMBNAIL_SIZES = (64, 256)
+
+
+class ThumbnailsField(serializers.Field):
+    # {'256': {'webp': url, 'jpeg': url}, ...} из <поле>_variants. Пока миниатюры текущего изображения не готовы,
+    # каждому размеру отдаётся оригинал: {'256': {'original': url}}; без изображения — пустой словарь
+    def __init__(self, original, sizes=None, **kwargs):
+        self.original = original
+        self.sizes = sizes
+        kwargs['read_only'] = True
+        kwargs.setdefault('source', variants_field(original))
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return super().get_attribute(instance), getattr(instance, self.original)
+
+    def to_representation(self, value):
+        variants, original = value
+        if not original:
+            return {}
+        variants = variants or {}
+        if variants.get('source') == original.name:
+            result = {size: {extension: default_storage.url(path) for extension, path in formats.items()}
+                      for size, formats in variants.items()
+                      if size != 'source' and (not self.sizes or int(size) in self.sizes)}
+        else:
+            result = {str(size): {'original': original.url} for size in self.sizes or THUMBNAIL_SIZES}
+        request = self.context.get('request')
+        if request is not None:
+            result = {size: {extension: request.build_absolute_uri(url) for extension, url in urls.items()}
+                      for size, urls in result.items()}
+        return result
+
+
+# Файлы в PROTECTED_MEDIA_ROOT: вместо MEDIA_URL отдаётся ссылка на view с проверкой прав
+PROTECTED_FILE_VIEWS = {
+    (Lesson, 'video_file'): 'lesson-video',
+    (CourseLanguages, 'video_filed'): 'course-language-video',
+    (AssignmentSubmission, 'submission_file'): 'submission-file',
+    (Certificate, 'certificate_file'): 'certificate-file',
+}
+
+
+def protected_file_url(instance, field, request=None):
+    # Ссылка на эндпоинт с проверкой прав; FieldFile.url ведёт на закрытый internal-location
+    url = reverse(PROTECTED_FILE_VIEWS[(type(instance), field)], args=[instance.pk])
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+class ProtectedFileField(serializers.FileField):
+    def to_representation(self, value):
+        if not value:
+            return None
+        return protected_file_url(value.instance, value.field.name, self.context.get('request'))
+
+
+class DynamicFieldsModelSerializer(serializers.ModelSerializer):
+    # Поддержка ?fields= и ?expand= на чтение; для записи набор полей не меняется
+
+    def build_standard_field(self, field_name, model_field):
+        field_class, field_kwargs = super().build_standard_field(field_name, model_field)
+        if (model_field.model, model_field.name) in PROTECTED_FILE_VIEWS:
+            field_class = ProtectedFileField
+        return field_class, field_kwargs
+
+    def get_fields_path(self):
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        root = self.context.get('fields_path')
+        if root:
+            names.append(root)
+        return '.'.join(reversed(names))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+
+        path = self.get_fields_path()
+        prefix = f'{path}.' if path else ''
+        fields = {
+            name: field for name, field in fields.items()
+            if field_is_requested(request, prefix + name)
+        }
+        for name, field in list(fields.items()):
+            many = isinstance(field, serializers.ListSerializer)
+            nested = field.child if many else field
+            if isinstance(nested, serializers.BaseSerializer) and not field_is_expanded(request, prefix + name):
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many, source=field.source)
+        return fields
 
 
-class RegisterStudentSerializer(serializers.ModelSerializer):
+class RegisterStudentSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Student
         fields = ['student_images','username', 'email', 'password', 'first_name', 'last_name', 'bio_student', 'grade_level']
@@ -39,31 +174,35 @@ class LoginStudentSerializer(serializers.Serializer):
         }
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = UserProfile
         fields = '__all__'
 
 
-class TeacherListSerializer(serializers.ModelSerializer):
+class TeacherListSerializer(DynamicFieldsModelSerializer):
+    profile_picture_thumbnails = ThumbnailsField('profile_picture', sizes=LIST_THUMBNAIL_SIZES)
+
     class Meta:
         model = Teacher
-        fields = ['username', 'profile_picture', 'years_of_experience']
+        fields = ['username', 'profile_picture_thumbnails', 'years_of_experience']
 
 
-class StudentListSimpleSerializer(serializers.ModelSerializer):
+class StudentListSimpleSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Student
         fields = ['username','first_name','last_name']
 
 
-class StudentListSerializer(serializers.ModelSerializer):
+class StudentListSerializer(DynamicFieldsModelSerializer):
+    student_images_thumbnails = ThumbnailsField('student_images', sizes=LIST_THUMBNAIL_SIZES)
+
     class Meta:
         model = Student
-        fields = ['username', 'student_images', 'grade_level']
+        fields = ['username', 'student_images_thumbnails', 'grade_level']
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(DynamicFieldsModelSerializer):
     student = StudentListSimpleSerializer()
     created_at = serializers.DateTimeField(format('%d - %m - %Y  %H:%M'))
     class Meta:
@@ -71,97 +210,117 @@ class ReviewSerializer(serializers.ModelSerializer):
         fields = ['student',  'stars', 'comment', 'created_at']
 
 
-class ReviewCreateSerializer(serializers.ModelSerializer):
+class ReviewCreateSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Review
         fields = ['id','student','stars','comment','created_at','course']
 
 
-class StudentDetailSerializer(serializers.ModelSerializer):
+class StudentDetailSerializer(DynamicFieldsModelSerializer):
+    student_images_thumbnails = ThumbnailsField('student_images')
+
     class Meta:
         model = Student
-        fields = ['username', 'student_images', 'grade_level', 'bio_student', 'date_of_birth']
+        fields = ['username', 'student_images', 'student_images_thumbnails', 'grade_level', 'bio_student',
+                  'date_of_birth']
 
 
-class SkillsSerializer(serializers.ModelSerializer):
+class SkillsSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Skills
         fields = ['skills']
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Category
         fields = ['category_name']
 
 
-class CourseLanguagesSerializer(serializers.ModelSerializer):
+class CourseLanguagesSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = CourseLanguages
         fields = ['language', 'video_filed', 'video_url', 'course']
 
 
-class LessonStudentSerializer(serializers.ModelSerializer):
+class LessonStudentSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Lesson
         fields = ['lesson_name', 'video_url', 'video_file', 'content']
 
 
-class CourseStudentListSerializer(serializers.ModelSerializer):
-    avg_rating = serializers.SerializerMethodField()
+class CourseStudentListSerializer(DynamicFieldsModelSerializer):
+    avg_rating = serializers.FloatField(read_only=True)
     total_people = serializers.SerializerMethodField()
     category = CategorySerializer()
-    skills = SkillsSerializer()
+    skills = SkillsSerializer(read_only=True, many=True)
+    course_images_thumbnails = ThumbnailsField('course_images', sizes=LIST_THUMBNAIL_SIZES)
     class Meta:
         model = Course
-        fields = [ 'course_name', 'course_images','category', 'level',  'price',
+        fields = [ 'course_name', 'course_images_thumbnails','category', 'level',  'price',
                   'avg_rating', 'total_people', 'skills']
 
-    def get_avg_rating(self, obj):
-        return obj.get_avg_rating()
-
     def get_total_people(self, obj):
         return obj.get_total_people()
 
 
 
-class CourseStudentDetailSerializer(serializers.ModelSerializer):
-    avg_rating = serializers.SerializerMethodField()
+LATEST_REVIEWS_COUNT = 5
+
+
+class CourseStudentDetailSerializer(DynamicFieldsModelSerializer):
+    avg_rating = serializers.FloatField(read_only=True)
     total_people = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
     category = CategorySerializer()
     skills = SkillsSerializer(read_only=True, many=True)
     teacher = TeacherListSerializer()
     created_at = serializers.DateField(format('%d - %m - %Y'))
     updated_at = serializers.DateField(format('%d - %m - %Y'))
-    reviews = ReviewSerializer(read_only=True, many=True)
+    latest_reviews = serializers.SerializerMethodField()
+    course_images_thumbnails = ThumbnailsField('course_images')
     class Meta:
         model = Course
-        fields = ['course_images', 'course_name', 'category', 'description', 'teacher', 'price', 'avg_rating',
-                  'total_people', 'created_at',
-                  'updated_at', 'duration', 'skills','reviews']
-
-    def get_avg_rating(self, obj):
-        return obj.get_avg_rating()
+        fields = ['course_images', 'course_images_thumbnails', 'course_name', 'category', 'description', 'teacher', 'price', 'avg_rating',
+                  'total_people', 'rating_histogram', 'created_at',
+                  'updated_at', 'duration', 'skills', 'latest_reviews']
 
     def get_total_people(self, obj):
         return obj.get_total_people()
 
+    def get_rating_histogram(self, obj):
+        return obj.get_rating_histogram()
+
+    def get_latest_reviews(self, obj):
+        # Остальные отзывы отдаются постранично через /courses/<pk>/reviews/
+        reviews = getattr(obj, 'latest_reviews', None)
+        if reviews is None:
+            reviews = obj.reviews.select_related('student').order_by('-created_at', '-id')[:LATEST_REVIEWS_COUNT]
+        context = {**self.context, 'fields_path': f'{self.get_fields_path()}.latest_reviews'.lstrip('.')}
+        return ReviewSerializer(reviews, many=True, context=context).data
+
 
-class AssignmentSimpleSerializers(serializers.ModelSerializer):
+class AssignmentSimpleSerializers(DynamicFieldsModelSerializer):
     class Meta:
         model = Assignment
         fields = ['assignment_name']
 
 
-class AssignmentSubmissionStudentSerializer(serializers.ModelSerializer):
-    students = StudentListSerializer()
+class AssignmentSubmissionStudentSerializer(DynamicFieldsModelSerializer):
+    students = serializers.SlugRelatedField(slug_field='username', read_only=True, many=True)
 
     class Meta:
         model = AssignmentSubmission
-        fields = ['students', 'course', 'submission_file']
+        fields = ['id', 'assignment', 'students', 'submission_file', 'submitted_at', 'grade']
+        read_only_fields = ['submitted_at', 'grade']
+
+    def validate_assignment(self, value):
+        if value.is_closed or value.due_date <= timezone.now():
+            raise serializers.ValidationError('Срок сдачи задания истёк')
+        return value
 
 
-class AssignmentStudentListSerializer(serializers.ModelSerializer):
+class AssignmentStudentListSerializer(DynamicFieldsModelSerializer):
     students = StudentListSerializer()
 
     class Meta:
@@ -169,7 +328,7 @@ class AssignmentStudentListSerializer(serializers.ModelSerializer):
         fields = ['students', 'assignment_name', 'description', 'due_date', 'course']
 
 
-class AssignmentStudentDetailSerializer(serializers.ModelSerializer):
+class AssignmentStudentDetailSerializer(DynamicFieldsModelSerializer):
     submissions = AssignmentSubmission()
     students = StudentListSerializer()
 
@@ -178,52 +337,256 @@ class AssignmentStudentDetailSerializer(serializers.ModelSerializer):
         fields = ['students', 'assignment_name', 'description', 'due_date', 'course', 'submissions']
 
 
-class ChoiceSerializer(serializers.ModelSerializer):
+class ChoiceSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Choice
         fields = ['text', 'is_correct']  # Добавляем флаг правильного ответа для преподавателя
 
 
-class QuestionSimpleSerializer(serializers.ModelSerializer):
+class ChoiceStudentSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = Choice
+        fields = ['id', 'text']  # Без is_correct: студент не должен видеть правильный ответ
+
+
+class QuestionSimpleSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Question
-        fields = ['question_name']
+        fields = ['text']
 
 
-class QuestionStudentSerializer(serializers.ModelSerializer):
+class QuestionStudentSerializer(DynamicFieldsModelSerializer):
+    choices = ChoiceStudentSerializer(read_only=True, many=True)
 
     class Meta:
         model = Question
-        fields = ['question_name', 'option_question']
-        read_only_fields = ['question_name']
+        fields = ['id', 'text', 'choices']
+        read_only_fields = ['text']
 
 
+class ExamListStudentSerializer(DynamicFieldsModelSerializer):
+    course = CourseStudentListSerializer()
 
+    class Meta:
+        model = Exam
+        fields = ['id', 'exam_name', 'course', 'passing_score', 'duration']
 
-class ExamListStudentSerializer(serializers.ModelSerializer):
+
+class ExamPaperSerializer(DynamicFieldsModelSerializer):
+    # Экзамен для студентов (см. exam_papers): без правильных ответов
+    questions = QuestionStudentSerializer(read_only=True, many=True)
     course = CourseStudentListSerializer()
 
     class Meta:
         model = Exam
-        fields = ['exam_name', 'course', 'question']
+        fields = ['id', 'exam_name', 'course', 'passing_score', 'duration', 'questions']
 
 
-class ExamDetailStudentSerializer(serializers.ModelSerializer):
-    question = QuestionStudentSerializer(read_only=True, many=True)
-    course = CourseStudentListSerializer()
+class ExamAnswerSerializer(serializers.Serializer):
+    question = serializers.IntegerField()
+    choices = serializers.ListField(child=serializers.IntegerField(), allow_empty=True)
+
+
+class ExamSubmissionSerializer(serializers.Serializer):
+    # Без answers попытка сдаётся по последнему автосохранению
+    answers = ExamAnswerSerializer(many=True, required=False)
+
+    def validate_answers(self, value):
+        answers = {}
+        for answer in value:
+            if answer['question'] in answers:
+                raise serializers.ValidationError(f"Вопрос {answer['question']} указан несколько раз")
+            answers[answer['question']] = set(answer['choices'])
+        return answers
+
+
+class ChoiceImportSerializer(serializers.Serializer):
+    text = serializers.CharField(max_length=255)
+    is_correct = serializers.BooleanField(default=False)
+
+
+class QuestionImportSerializer(serializers.Serializer):
+    text = serializers.CharField(max_length=255)
+    choices = ChoiceImportSerializer(many=True)
+
+    def validate_choices(self, value):
+        if len(value) < 2:
+            raise serializers.ValidationError('Нужно минимум два варианта ответа')
+        if not any(choice['is_correct'] for choice in value):
+            raise serializers.ValidationError('Нет ни одного правильного варианта')
+        return value
+
+
+class ExamImportSerializer(DynamicFieldsModelSerializer):
+    # Экзамен целиком одним документом: вопросы и варианты вставляются через bulk_create в одной транзакции
+    questions = QuestionImportSerializer(many=True, allow_empty=False)
 
     class Meta:
         model = Exam
-        fields = ['exam_name', 'course', 'passing_score', 'duration', 'question']
+        fields = ['exam_name', 'course', 'passing_score', 'duration', 'questions']
+
+    def validate_course(self, value):
+        teacher = self.context.get('teacher')
+        if teacher is not None and value.teacher_id != teacher.pk:
+            raise serializers.ValidationError('Курс принадлежит другому преподавателю')
+        return value
 
+    def create(self, validated_data):
+        questions = validated_data.pop('questions')
+        with transaction.atomic():
+            exam = Exam.objects.create(**validated_data)
+            created = Question.objects.bulk_create([Question(exam=exam, text=question['text'])
+                                                    for question in questions])
+            Choice.objects.bulk_create([
+                Choice(question=question, **choice)
+                for question, data in zip(created, questions)
+                for choice in data['choices']
+            ])
+        return exam
+
+
+class ChoiceStatsSerializer(DynamicFieldsModelSerializer):
+    picks = serializers.SerializerMethodField()
 
-class CertificateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Choice
+        fields = ['id', 'text', 'is_correct', 'picks']
+
+    def get_picks(self, obj):
+        stats = getattr(obj, 'stats', None)
+        return stats.picks if stats else 0
+
+
+class QuestionStatsSerializer(DynamicFieldsModelSerializer):
+    # Счётчики берутся из QuestionStats/ChoiceStats, подгруженных через select_related — без обхода UserAnswer
+    attempts = serializers.SerializerMethodField()
+    correct = serializers.SerializerMethodField()
+    difficulty = serializers.SerializerMethodField()
+    discrimination = serializers.SerializerMethodField()
+    choices = ChoiceStatsSerializer(read_only=True, many=True)
+
+    class Meta:
+        model = Question
+        fields = ['id', 'text', 'attempts', 'correct', 'difficulty', 'discrimination', 'choices']
+
+    def get_stats(self, obj):
+        return getattr(obj, 'stats', None) or QuestionStats(question=obj)
+
+    def get_attempts(self, obj):
+        return self.get_stats(obj).attempts
+
+    def get_correct(self, obj):
+        return self.get_stats(obj).correct
+
+    def get_difficulty(self, obj):
+        return self.get_stats(obj).get_difficulty()
+
+    def get_discrimination(self, obj):
+        return self.get_stats(obj).get_discrimination()
+
+
+class ExamStatsSerializer(DynamicFieldsModelSerializer):
+    questions = QuestionStatsSerializer(read_only=True, many=True)
+
+    class Meta:
+        model = Exam
+        fields = ['id', 'exam_name', 'questions']
+
+
+class ExamAttemptSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = ExamAttempt
+        fields = ['id', 'exam', 'status', 'started_at', 'expires_at', 'submitted_at', 'score', 'answers']
+        read_only_fields = fields
+
+
+class SubmissionGradeSerializer(serializers.Serializer):
+    submission = serializers.IntegerField()
+    grade = serializers.IntegerField(min_value=1, max_value=100)
+
+
+class BulkGradeSerializer(serializers.Serializer):
+    grades = SubmissionGradeSerializer(many=True, allow_empty=False)
+
+    def validate_grades(self, value):
+        # {id решения: оценка}; порядок строк сохраняется для сообщений об ошибках
+        grades = {}
+        for row in value:
+            if row['submission'] in grades:
+                raise serializers.ValidationError(f"Решение {row['submission']} указано несколько раз")
+            grades[row['submission']] = row['grade']
+        return grades
+
+
+class GradebookEntrySerializer(DynamicFieldsModelSerializer):
+    username = serializers.CharField(source='student.username', read_only=True)
+    full_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = GradebookEntry
+        fields = ['student', 'username', 'full_name', 'assignment_grades', 'exam_scores', 'updated_at']
+
+    def get_full_name(self, obj):
+        return obj.student.get_full_name()
+
+
+class NotificationSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = Notification
+        fields = ['id', 'kind', 'assignment', 'message', 'created_at', 'read_at']
+
+
+class UploadSessionSerializer(DynamicFieldsModelSerializer):
+    chunk_size = serializers.IntegerField(required=False)
+    chunks = serializers.SerializerMethodField()
+    received = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'target', 'object_id', 'filename', 'size', 'chunk_size', 'chunks', 'received', 'status',
+                  'sha256', 'created_at', 'completed_at']
+        read_only_fields = ['status', 'sha256', 'created_at', 'completed_at']
+
+    def get_chunks(self, obj):
+        return obj.get_chunk_count()
+
+    def get_received(self, obj):
+        return received_chunks(obj)
+
+    def validate_filename(self, value):
+        return os.path.basename(value)
+
+    def validate_size(self, value):
+        if not 0 < value <= UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'Размер файла должен быть от 1 до {UPLOAD_MAX_SIZE} байт')
+        return value
+
+    def validate_chunk_size(self, value):
+        if not UPLOAD_MIN_CHUNK_SIZE <= value <= UPLOAD_MAX_CHUNK_SIZE:
+            raise serializers.ValidationError(
+                f'Размер части должен быть от {UPLOAD_MIN_CHUNK_SIZE} до {UPLOAD_MAX_CHUNK_SIZE} байт')
+        return value
+
+    def validate(self, data):
+        user = self.context['request'].user
+        if not target_queryset(data['target'], user.pk).filter(pk=data['object_id']).exists():
+            raise serializers.ValidationError({'object_id': 'Объект не найден или недоступен для загрузки'})
+        data.setdefault('chunk_size', UPLOAD_DEFAULT_CHUNK_SIZE)
+        return data
+
+
+class UploadCompleteSerializer(serializers.Serializer):
+    # Без контрольной суммы клиента повреждённую при передаче сборку не отличить от целой
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$')
+
+
+class CertificateSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Certificate
         fields = ['student', 'course', 'issued_at', 'certificate_url', 'certificate_file']
 
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(DynamicFieldsModelSerializer):
     course = CourseStudentListSerializer()
     total_price = serializers.SerializerMethodField()
 
@@ -235,7 +598,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         return obj.get_total_price()
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(DynamicFieldsModelSerializer):
     total_price = serializers.SerializerMethodField()
     student = StudentListSerializer()
     items = CartItemSerializer(read_only=True, many=True)
@@ -250,7 +613,7 @@ class CartSerializer(serializers.ModelSerializer):
         return obj.get_total_price()
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsModelSerializer):
     cart_item = CartItemSerializer()
     student = StudentListSerializer()
 
@@ -264,7 +627,7 @@ class OrderSerializer(serializers.ModelSerializer):
 #For Teachers
 
 
-class RegisterTeacherSerializer(serializers.ModelSerializer):
+class RegisterTeacherSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Teacher
         fields = ['profile_picture','username', 'email', 'password', 'first_name', 'last_name', 'bio', 'expertise', 'years_of_experience',
@@ -304,66 +667,66 @@ class LoginTeacherSerializer(serializers.Serializer):
 
 
 
-class TeacherDetailSerializer(serializers.ModelSerializer):
+class TeacherDetailSerializer(DynamicFieldsModelSerializer):
+    profile_picture_thumbnails = ThumbnailsField('profile_picture')
+
     class Meta:
         model = Teacher
-        fields = ['username', 'profile_picture', 'bio', 'expertise', 'years_of_experience', 'social_links']
+        fields = ['username', 'profile_picture', 'profile_picture_thumbnails', 'bio', 'expertise', 'years_of_experience', 'social_links']
 
 
-class CourseTeachersListSerializer(serializers.ModelSerializer):
-    avg_rating = serializers.SerializerMethodField()
+class CourseTeachersListSerializer(DynamicFieldsModelSerializer):
+    avg_rating = serializers.FloatField(read_only=True)
     total_people = serializers.SerializerMethodField()
     category = CategorySerializer()
-    skills = SkillsSerializer()
+    skills = SkillsSerializer(read_only=True, many=True)
+    course_images_thumbnails = ThumbnailsField('course_images', sizes=LIST_THUMBNAIL_SIZES)
 
     class Meta:
         model = Course
-        fields = ['teacher', 'course_images', 'course_name', 'category', 'skills', 'description', 'level', 'price',
-                  'avg_rating', 'total_people', 'created_at', 'updated_at', 'duration']
-
-    def get_avg_rating(self, obj):
-        return obj.get_avg_rating()
+        fields = ['teacher', 'course_images', 'course_images_thumbnails', 'course_name', 'category', 'skills',
+                  'description', 'level', 'price', 'avg_rating', 'total_people', 'created_at', 'updated_at', 'duration']
+        # Оригинал принимается при создании, а в списке отдаются только миниатюры
+        extra_kwargs = {'course_images': {'write_only': True}}
 
     def get_total_people(self, obj):
         return obj.get_total_people()
 
 
-class CourseTeachersDetailSerializer(serializers.ModelSerializer):
-    avg_rating = serializers.SerializerMethodField()
+class CourseTeachersDetailSerializer(DynamicFieldsModelSerializer):
+    avg_rating = serializers.FloatField(read_only=True)
     total_people = serializers.SerializerMethodField()
     course_languages = CourseLanguagesSerializer(read_only=True, many=True)
     category = CategorySerializer()
     skills = SkillsSerializer(read_only=True, many=True)
     created_at = serializers.DateField(format('%d - %m -%Y'))
-    update_at = serializers.DateField(format('%d - %m -%Y'))
+    updated_at = serializers.DateField(format('%d - %m -%Y'))
     class Meta:
         model = Course
         fields = ['teacher', 'course_images', 'course_name', 'category', 'skills', 'description', 'level', 'price',
                   'avg_rating', 'total_people', 'created_at', 'updated_at', 'duration', 'course_languages']
 
-    def get_avg_rating(self, obj):
-        return obj.get_avg_rating()
-
     def get_total_people(self, obj):
         return obj.get_total_people()
 
 
-class QuestionTeachersSerializer(serializers.ModelSerializer):
+class QuestionTeachersSerializer(DynamicFieldsModelSerializer):
+    choices = ChoiceSerializer(read_only=True, many=True)
 
     class Meta:
         model = Question
-        fields = ['teacher', 'question_name']
+        fields = ['id', 'exam', 'text', 'choices']
 
 
-class ExamListTeachersSerializer(serializers.ModelSerializer):
+class ExamListTeachersSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Exam
         fields = ['teacher', 'exam_name', 'course', 'passing_score', 'duration']
 
 
-class ExamDetailTeachersSerializer(serializers.ModelSerializer):
-    question = QuestionStudentSerializer(read_only=True, many=True)
+class ExamDetailTeachersSerializer(DynamicFieldsModelSerializer):
+    questions = QuestionTeachersSerializer(read_only=True, many=True)
 
     class Meta:
         model = Exam
-        fields = ['exam_name', 'course', 'passing_score', 'duration', 'question']
\ No newline at end of file
+        fields = ['exam_name', 'course', 'passing_score', 'duration', 'questions']
\ No newline at end of file
@@ -0,0 +1,247 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import search
+from .exam_papers import remove_exam_papers
+from .gradebook import record_pair_grades, record_submission_grades, submission_pairs
+from .thumbnails import THUMBNAIL_FIELDS, schedule_thumbnails
+from .media_blobs import remember_deleted_names, remember_names, track_deleted, track_saved
+from .authentication import invalidate_users
+from .cache import bump_catalog, bump_versions
+from .models import (AssignmentSubmission, Cart, CartItem, Category, Certificate, Choice, Course, CourseLanguages,
+                     Exam, Lesson, Question, Review, Skills, Student, Teacher, UserProfile)
+
+
+def deleting_course(origin):
+    # При каскадном удалении курса пересчитывать его агрегаты незачем
+    if isinstance(origin, Course):
+        return True
+    return isinstance(origin, QuerySet) and origin.model is Course
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, origin=None, **kwargs):
+    if deleting_course(origin):
+        return
+    Course.update_rating(instance.course_id, instance.stars, -1)
+
+
+# Поисковый индекс курсов
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, **kwargs):
+    search.index_courses([instance.pk])
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs):
+    search.remove_courses([instance.pk])
+
+
+@receiver(m2m_changed, sender=Course.skills.through)
+def course_skills_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        search.index_courses([instance.pk])
+    elif action == 'post_clear':
+        search.index_courses(getattr(instance, '_search_course_ids', []))
+    else:
+        search.index_courses(pk_set)
+
+
+@receiver(m2m_changed, sender=Course.skills.through)
+def skill_courses_clearing(sender, instance, action, reverse, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._search_course_ids = list(instance.courses.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Skills)
+def skill_saved(sender, instance, created, **kwargs):
+    if not created:
+        search.index_courses(instance.courses.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Skills)
+def skill_deleting(sender, instance, **kwargs):
+    instance._search_course_ids = list(instance.courses.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Skills)
+def skill_deleted(sender, instance, **kwargs):
+    search.index_courses(getattr(instance, '_search_course_ids', []))
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, created, **kwargs):
+    if not created:
+        search.index_courses(instance.courses.values_list('pk', flat=True))
+
+
+# Инвалидация кэша каталога
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    bump_catalog([instance.pk])
+
+
+@receiver(m2m_changed, sender=Course.skills.through)
+def course_skills_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    # Курсы навыка при clear() известны только до удаления связей; сама версия всё равно меняется после коммита
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            bump_catalog([instance.pk])
+    elif action == 'pre_clear':
+        bump_catalog(instance.courses.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        bump_catalog(pk_set)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, **kwargs):
+    bump_catalog({instance.course_id, getattr(instance, '_previous_course_id', None)} - {None})
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted_cache(sender, instance, **kwargs):
+    bump_catalog([instance.course_id])
+
+
+@receiver(post_save, sender=CourseLanguages)
+@receiver(post_delete, sender=CourseLanguages)
+def course_language_changed(sender, instance, **kwargs):
+    bump_catalog([instance.course_id])
+
+
+@receiver(post_save, sender=Skills)
+@receiver(pre_delete, sender=Skills)
+def skill_changed(sender, instance, **kwargs):
+    bump_catalog(instance.courses.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    bump_catalog(instance.courses.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Teacher)
+def teacher_changed(sender, instance, **kwargs):
+    # В списке каталога преподаватель не выводится, поэтому достаточно сбросить его курсы
+    bump_versions([f'course:{pk}' for pk in instance.courses_teacher.values_list('pk', flat=True)])
+
+
+# Версии для ETag/Last-Modified экзаменов и корзины
+
+@receiver(post_save, sender=Exam)
+@receiver(post_delete, sender=Exam)
+def exam_changed(sender, instance, **kwargs):
+    bump_versions([f'exam:{instance.pk}'])
+
+
+@receiver(post_delete, sender=Exam)
+def exam_deleted(sender, instance, **kwargs):
+    remove_exam_papers(instance.pk)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    bump_versions([f'exam:{instance.exam_id}'])
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    exam_ids = Question.objects.filter(pk=instance.question_id).values_list('exam_id', flat=True)
+    bump_versions([f'exam:{pk}' for pk in exam_ids])
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def cart_item_changed(sender, instance, **kwargs):
+    student_ids = Cart.objects.filter(pk=instance.cart_id).values_list('student_id', flat=True)
+    bump_versions([f'cart:{pk}' for pk in student_ids])
+
+
+# Журнал оценок: одиночные правки решений (админка, API); массовое выставление обновляет журнал само
+
+@receiver(post_save, sender=AssignmentSubmission)
+def submission_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and 'grade' not in update_fields):
+        return
+    transaction.on_commit(lambda: record_submission_grades([instance.pk]))
+
+
+@receiver(m2m_changed, sender=AssignmentSubmission.students.through)
+def submission_students_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != 'post_add':
+        return
+    submission_ids = pk_set if reverse else [instance.pk]
+    transaction.on_commit(lambda: record_submission_grades(submission_ids))
+
+
+@receiver(pre_delete, sender=AssignmentSubmission)
+def submission_deleting(sender, instance, **kwargs):
+    # Студенты решения известны только до удаления связей; лучшая оценка пересчитывается уже без него
+    pairs = submission_pairs([instance.pk])
+    transaction.on_commit(lambda: record_pair_grades(pairs))
+
+
+# Миниатюры изображений курсов, преподавателей и студентов
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Student)
+def image_saved(sender, instance, **kwargs):
+    schedule_thumbnails(instance, THUMBNAIL_FIELDS[sender])
+
+
+# Счётчики ссылок на blob'ы в blob_storage: прежние имена читаются перед сохранением и удалением,
+# разница пишется после
+
+@receiver(pre_save, sender=Lesson)
+@receiver(pre_save, sender=CourseLanguages)
+@receiver(pre_save, sender=Certificate)
+@receiver(pre_save, sender=AssignmentSubmission)
+def blob_model_saving(sender, instance, update_fields=None, **kwargs):
+    remember_names(instance, update_fields)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=CourseLanguages)
+@receiver(post_save, sender=Certificate)
+@receiver(post_save, sender=AssignmentSubmission)
+def blob_model_saved(sender, instance, update_fields=None, **kwargs):
+    track_saved(instance, update_fields)
+
+
+@receiver(pre_delete, sender=Lesson)
+@receiver(pre_delete, sender=CourseLanguages)
+@receiver(pre_delete, sender=Certificate)
+@receiver(pre_delete, sender=AssignmentSubmission)
+def blob_model_deleting(sender, instance, **kwargs):
+    remember_deleted_names(instance)
+
+
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=CourseLanguages)
+@receiver(post_delete, sender=Certificate)
+@receiver(post_delete, sender=AssignmentSubmission)
+def blob_model_deleted(sender, instance, **kwargs):
+    track_deleted(instance)
+
+
+# Кэш пользователей для CachedJWTAuthentication: смена пароля, деактивация и правка профиля сбрасывают запись;
+# update() мимо сигналов должен вызывать invalidate_users сам
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=Student)
+def user_changed(sender, instance, **kwargs):
+    invalidate_users([instance.pk])
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+BLOB_ROOT = 'blobs'
+BLOB_BLOCK_SIZE = 64 * 1024
+BLOB_MAX_EXTENSION = 10
+
+
+def blob_name(digest, extension=''):
+    # blobs/ab/cd/<sha256>.<расширение>: расширение сохраняется, чтобы по имени определялся Content-Type
+    return f'{BLOB_ROOT}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(f'{BLOB_ROOT}/')
+
+
+@deconstructible
+class DedupFileSystemStorage(FileSystemStorage):
+    # Файл хранится один раз под своим sha256; поля разных строк с одинаковым содержимым ссылаются на один blob.
+    # Удаляет blob'ы только collect_media_blobs, когда на них больше не ссылается ни одна строка.
+    # Лежат в PROTECTED_MEDIA_ROOT, вне MEDIA_ROOT: отдаются только через проверку прав (см. streaming.serve_protected).
+    # url() ведёт на internal-location веб-сервера, снаружи недоступный; ссылки для клиентов строит
+    # serializers.protected_file_url
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.PROTECTED_MEDIA_ROOT)
+
+    @cached_property
+    def base_url(self):
+        base_url = self._value_or_setting(self._base_url, settings.PROTECTED_MEDIA_INTERNAL_URL)
+        return base_url if base_url.endswith('/') else f'{base_url}/'
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'PROTECTED_MEDIA_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+        elif setting == 'PROTECTED_MEDIA_INTERNAL_URL':
+            self.__dict__.pop('base_url', None)
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        extension = os.path.splitext(name)[1].lower()
+        if len(extension) > BLOB_MAX_EXTENSION:
+            extension = ''
+        digest = getattr(content, 'sha256', None)
+        if digest and hasattr(content, 'temporary_file_path'):
+            # Сумма уже посчитана при сборке загрузки — файл не читается второй раз
+            source, size, owned = content.temporary_file_path(), content.size, False
+        else:
+            source, size, digest = self.write_temporary(content)
+            owned = True
+
+        name = blob_name(digest, extension)
+        path = self.path(name)
+        # Сначала строка: пока её держит транзакция вызывающего, сборщик строку пропускает, а если он удалил
+        # blob раньше, файл ниже запишется заново. Откат транзакции оставит файл без строки — его уберёт
+        # collect_orphan_files
+        MediaBlob.objects.bulk_create([MediaBlob(name=name, digest=digest, size=size, stored_at=timezone.now())],
+                                      update_conflicts=True, unique_fields=['name'], update_fields=['stored_at'])
+        try:
+            if os.path.exists(path):
+                os.utime(path)  # свежий mtime защищает файл от collect_orphan_files, пока строка не закоммичена
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                file_move_safe(source, path, allow_overwrite=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(path, self.file_permissions_mode)
+        finally:
+            if owned and os.path.exists(source):
+                os.unlink(source)
+        return name
+
+    def write_temporary(self, content):
+        # Содержимое копируется блоками во временный файл рядом с blob'ами, sha256 считается по пути
+        directory = self.path(f'{BLOB_ROOT}/tmp')
+        os.makedirs(directory, exist_ok=True)
+        digest, size = hashlib.sha256(), 0
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as output:
+            for block in content.chunks(BLOB_BLOCK_SIZE):
+                block = block.encode() if isinstance(block, str) else block
+                digest.update(block)
+                size += len(block)
+                output.write(block)
+        return output.name, size, digest.hexdigest()
+
+    def delete(self, name):
+        if not is_blob_name(name):
+            super().delete(name)
+
+    def delete_blob(self, name):
+        super().delete(name)
+
+
+blob_storage = DedupFileSystemStorage()
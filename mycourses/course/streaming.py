@@ -0,0 +1,135 @@
+import mimetypes
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework.negotiation import DefaultContentNegotiation
+
+STREAM_BLOCK_SIZE = 64 * 1024  # больше этого за одно чтение в памяти не держится
+RANGE_RE = re.compile(r'^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$', re.IGNORECASE)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class RangeFileWrapper:
+    # Отдаёт length байт файла начиная со start кусками не больше block_size
+
+    def __init__(self, file, start=0, length=None, block_size=STREAM_BLOCK_SIZE):
+        self.file = file
+        self.remaining = length
+        self.block_size = block_size
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining is not None:
+            size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        if self.remaining is not None:
+            self.remaining -= len(data)
+        return data
+
+    def __iter__(self):
+        while True:
+            data = self.read(self.block_size)
+            if not data:
+                break
+            yield data
+
+    def close(self):
+        self.file.close()
+
+
+class MediaContentNegotiation(DefaultContentNegotiation):
+    # Плееры присылают Accept: video/*; ответ — байты файла, рендерер не выбирается
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def parse_range(header, size):
+    # Один диапазон bytes=start-end, bytes=start- или bytes=-suffix; None — заголовок игнорируется
+    match = RANGE_RE.match(header or '')
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        length = int(last)
+        if not length or not size:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def if_range_matches(request, etag, last_modified):
+    # Диапазон отдаётся, только если файл не изменился с момента, когда клиент получил его начало
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith(('"', 'W/')):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+def stream_file(request, file, content_type=None, block_size=STREAM_BLOCK_SIZE):
+    # file — FieldFile; размер и время изменения берутся из хранилища, сам файл открывается только для отдачи
+    storage, name = file.storage, file.name
+    size = storage.size(name)
+    last_modified = int(storage.get_modified_time(name).timestamp())
+    etag = quote_etag(f'{last_modified:x}-{size:x}')
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    start, end, status = 0, size - 1, 200
+    if request.META.get('HTTP_RANGE') and if_range_matches(request, etag, last_modified):
+        try:
+            requested = parse_range(request.META['HTTP_RANGE'], size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if requested is not None:
+            (start, end), status = requested, 206
+
+    length = end - start + 1 if size else 0
+    content_type = content_type or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    wrapper = RangeFileWrapper(storage.open(name, 'rb'), start, length, block_size)
+    response = StreamingHttpResponse(wrapper, status=status, content_type=content_type)
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, max-age=3600'
+    if status == 206:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def offload_file(file, content_type=None):
+    # Проверка прав уже сделана, байты отдаёт веб-сервер; воркер освобождается сразу
+    response = HttpResponse(content_type=content_type or mimetypes.guess_type(file.name)[0]
+                            or 'application/octet-stream')
+    if settings.PROTECTED_MEDIA_SERVER == 'nginx':
+        response['X-Accel-Redirect'] = f'{settings.PROTECTED_MEDIA_INTERNAL_URL.rstrip("/")}/{quote(file.name)}'
+    else:
+        response['X-Sendfile'] = file.path
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
+def serve_protected(request, file, content_type=None):
+    if settings.PROTECTED_MEDIA_SERVER:
+        return offload_file(file, content_type)
+    return stream_file(request, file, content_type)
@@ -1,3 +1,1236 @@
-from django.test import TestCase
+import csv
+import hashlib
+import json
+import os
+import zipfile
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from PIL import Image
+
+from .authentication import CachedJWTAuthentication, invalidate_users, local_user_cache
+from .deadlines import send_reminders
+from .cache import version_key
+from .attempts import attempt_cache_key, autosave_buffer, expire_attempts
+from .exam_papers import paper_cache_key, paper_version
+from .models import *
+from .renderers import MessagePackParser, MessagePackRenderer, ORJSONRenderer, msgpack, orjson
+
+
+ROW_COUNTS = (10, 100, 1000)
+
+
+class CourseDataTestCase(TestCase):
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = Teacher.objects.create(username='teacher', expertise='python')
+        cls.students = [Student.objects.create(username=f'student{i}', grade_level='Beginner') for i in range(3)]
+        cls.category = Category.objects.create(category_name='Programming')
+        cls.skills = Skills.objects.bulk_create([Skills(skills=f'skill{i}') for i in range(3)])
+
+    def setUp(self):
+        cache.clear()
+        local_user_cache.clear()
+        files = TemporaryDirectory()
+        self.addCleanup(files.cleanup)
+        self.files_root = Path(files.name)
+        overridden = override_settings(EXAM_PAPERS_ROOT=str(self.files_root / 'exam_papers'),
+                                       MEDIA_ROOT=str(self.files_root / 'media'),
+                                       UPLOAD_CHUNKS_ROOT=str(self.files_root / 'chunks'),
+                                       PROTECTED_MEDIA_ROOT=str(self.files_root / 'protected'),
+                                       THUMBNAIL_WORKERS=0)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+
+    def create_courses(self, count):
+        courses = Course.objects.bulk_create([
+            Course(course_name=f'course{i}', category=self.category, teacher=self.teacher, description='text',
+                   price=10, duration='1–4 недели')
+            for i in range(count)
+        ])
+        Course.skills.through.objects.bulk_create([
+            Course.skills.through(course_id=course.pk, skills_id=skill.pk)
+            for course in courses for skill in self.skills
+        ])
+        CourseLanguages.objects.bulk_create([
+            CourseLanguages(course=course, teacher=self.teacher, language='en') for course in courses
+        ])
+        return courses
+
+    def create_reviews(self, course, count):
+        reviews = Review.objects.bulk_create([
+            Review(course=course, student=self.students[i % len(self.students)], stars=i % 5 + 1, comment='ok')
+            for i in range(count)
+        ])
+        call_command('rebuild_course_ratings', stdout=StringIO())
+        return reviews
+
+
+class QueryBudgetTestCase(CourseDataTestCase):
+    # Количество SQL-запросов на эндпоинт не должно зависеть от количества строк
+
+    def assertQueryBudget(self, url, budget):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{url}: {len(queries)} запросов при бюджете {budget}\n' + '\n'.join(q['sql'] for q in queries),
+        )
+        return response
+
+    def test_courses_list(self):
+        for count in ROW_COUNTS:
+            with self.subTest(rows=count):
+                self.create_courses(count)
+                self.assertQueryBudget(reverse('courses-list'), 2)
+                Course.objects.all().delete()
+
+    def test_courses_detail(self):
+        for count in ROW_COUNTS:
+            with self.subTest(rows=count):
+                course = self.create_courses(1)[0]
+                self.create_reviews(course, count)
+                self.assertQueryBudget(reverse('courses-detail', args=[course.pk]), 3)
+                course.delete()
+
+    def test_course_reviews_feed(self):
+        for count in ROW_COUNTS:
+            with self.subTest(rows=count):
+                course = self.create_courses(1)[0]
+                self.create_reviews(course, count)
+                response = self.assertQueryBudget(reverse('courses-reviews', args=[course.pk]), 2)
+                self.assertEqual(len(response.data['results']), min(count, 20))
+                course.delete()
+
+    def test_courses_for_teacher_list(self):
+        for count in ROW_COUNTS:
+            with self.subTest(rows=count):
+                self.create_courses(count)
+                self.assertQueryBudget(reverse('course_for_teacher'), 2)
+                Course.objects.all().delete()
+
+    def test_courses_for_teacher_detail(self):
+        self.client.force_authenticate(self.teacher)
+        for count in ROW_COUNTS:
+            with self.subTest(rows=count):
+                course = self.create_courses(1)[0]
+                self.create_reviews(course, count)
+                self.assertQueryBudget(reverse('course_detail_for_detail', args=[course.pk]), 3)
+                course.delete()
+
+
+class CursorPaginationTestCase(CourseDataTestCase):
+
+    def test_reviews_are_walked_page_by_page(self):
+        course = self.create_courses(1)[0]
+        self.create_reviews(course, 45)
+        seen = []
+        url = reverse('review_create') + '?page_size=20'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 20)
+            seen.extend(review['id'] for review in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(sorted(seen), sorted(Review.objects.values_list('id', flat=True)))
+
+    def test_page_size_is_capped(self):
+        self.create_courses(150)
+        response = self.client.get(reverse('courses-list') + '?page_size=1000')
+        self.assertEqual(len(response.data['results']), 100)
+
+
+class CourseSearchTestCase(CourseDataTestCase):
+
+    def create_course(self, **kwargs):
+        kwargs.setdefault('description', 'text')
+        return Course.objects.create(category=self.category, teacher=self.teacher, price=10,
+                                     duration='1–4 недели', **kwargs)
+
+    def search(self, text, language='en'):
+        response = self.client.get(reverse('courses-list'), {'search': text}, HTTP_ACCEPT_LANGUAGE=language)
+        self.assertEqual(response.status_code, 200)
+        return [course['course_name'] for course in response.data['results']]
+
+    def test_ranked_prefix_search(self):
+        self.create_course(course_name='Cooking basics', description='Python is mentioned here')
+        self.create_course(course_name='Python for beginners')
+        self.assertEqual(self.search('pyth'), ['Python for beginners', 'Cooking basics'])
+
+    def test_translated_columns_skills_and_category(self):
+        course = self.create_course(course_name_en='Databases', course_name_ru='Базы данных')
+        course.skills.add(Skills.objects.create(skills='PostgreSQL'))
+        self.assertEqual(self.search('базы', 'ru'), ['Базы данных'])
+        self.assertEqual(self.search('postgre'), ['Databases'])
+        self.assertEqual(self.search('programming'), ['Databases'])
+
+        self.category.category_name = 'Data'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        self.assertEqual(self.search('programming'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course.delete()
+        self.assertEqual(self.search('databases'), [])
+
+    def test_search_results_are_paginated_by_rank(self):
+        for i in range(5):
+            self.create_course(course_name=f'Python {i}')
+        first = self.client.get(reverse('courses-list'), {'search': 'python', 'page_size': 2})
+        second = self.client.get(first.data['next'])
+        third = self.client.get(second.data['next'])
+        names = [course['course_name'] for page in (first, second, third) for course in page.data['results']]
+        self.assertEqual(sorted(names), [f'Python {i}' for i in range(5)])
+
+    def test_search_is_not_truncated(self):
+        Course.objects.bulk_create([
+            Course(course_name=f'Python {i}', category=self.category, teacher=self.teacher, description='text',
+                   price=10, duration='1–4 недели') for i in range(600)
+        ])
+        call_command('rebuild_search_index', stdout=StringIO())
+        url, seen = reverse('courses-list') + '?search=python&page_size=100', []
+        while url:
+            response = self.client.get(url)
+            seen += [course['course_name'] for course in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(len(seen), 600)
+        self.assertEqual(len(set(seen)), 600)
+
+
+class CourseFacetsTestCase(CourseDataTestCase):
+
+    def test_facet_counts_ignore_own_filter(self):
+        courses = self.create_courses(4)
+        other = Category.objects.create(category_name='Design')
+        Course.objects.filter(pk=courses[0].pk).update(category=other, level='Средний')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('courses-list'), {'facets': 'true', 'category': self.category.pk})
+        facets = response.data['facets']
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertCountEqual(facets['category'], [{'value': self.category.pk, 'count': 3},
+                                                   {'value': other.pk, 'count': 1}])
+        self.assertEqual(facets['level'], [{'value': 'beginner', 'count': 3}])
+        self.assertEqual(facets['skills'], [{'value': skill.pk, 'count': 3} for skill in self.skills])
+        self.assertEqual(facets['course_languages'], [{'value': 'en', 'count': 3}])
+        self.assertLessEqual(len(queries), 4 + len(facets))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('courses-list'), {'facets': 'true', 'category': self.category.pk})
+        self.assertLessEqual(len(queries), 3)
+
+    def test_language_facet_counts_courses(self):
+        courses = self.create_courses(2)
+        CourseLanguages.objects.create(course=courses[0], teacher=self.teacher, language='en')
+        CourseLanguages.objects.create(course=courses[0], teacher=self.teacher, language='ru')
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get(reverse('courses-list'), {'facets': 'true', 'search': 'course'})
+        self.assertEqual(response.data['facets']['course_languages'],
+                         [{'value': 'en', 'count': 2}, {'value': 'ru', 'count': 1}])
+        response = self.client.get(reverse('courses-list'), {'course_languages': 'ru'})
+        self.assertEqual([course['course_name'] for course in response.data['results']], ['course0'])
+
+
+class CatalogCacheTestCase(CourseDataTestCase):
+
+    def get(self, url, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_list_is_cached_per_language_and_invalidated(self):
+        course = self.create_courses(2)[0]
+        url = reverse('courses-list')
+        self.get(url)
+        response, queries = self.get(url)
+        self.assertEqual(queries, 0)
+        self.assertGreater(self.get(url + '?page_size=1')[1], 0)
+        self.assertGreater(self.get(url, HTTP_ACCEPT_LANGUAGE='ru')[1], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(course=course, student=self.students[0], stars=4)
+        response, queries = self.get(url)
+        self.assertGreater(queries, 0)
+        self.assertIn(4.0, [item['avg_rating'] for item in response.data['results']])
+
+    def test_detail_is_invalidated_only_for_changed_course(self):
+        first, second = self.create_courses(2)
+        self.get(reverse('courses-detail', args=[first.pk]))
+        self.get(reverse('courses-detail', args=[second.pk]))
+
+        self.category.category_name = 'Other'
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.category.save()
+            self.assertEqual(self.get(reverse('courses-detail', args=[first.pk]))[1], 0)  # до коммита кэш прежний
+        self.assertTrue(callbacks)
+        response, queries = self.get(reverse('courses-detail', args=[first.pk]))
+        self.assertGreater(queries, 0)
+        self.assertEqual(response.data['category']['category_name'], 'Other')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.skills.clear()
+        self.assertEqual(self.get(reverse('courses-detail', args=[first.pk]))[1], 0)
+        self.assertEqual(self.get(reverse('courses-detail', args=[second.pk]))[0].data['skills'], [])
+
+    def test_moved_review_invalidates_both_courses(self):
+        first, second = self.create_courses(2)
+        review = Review.objects.create(course=first, student=self.students[0], stars=4)
+        self.get(reverse('courses-detail', args=[first.pk]))
+        self.get(reverse('courses-detail', args=[second.pk]))
+
+        review.course = second
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            review.save()
+        self.assertEqual(sum(q['sql'].startswith('SELECT') and 'course_review' in q['sql'] for q in queries), 1)
+        self.assertEqual(self.get(reverse('courses-detail', args=[first.pk]))[0].data['avg_rating'], 0.0)
+        self.assertEqual(self.get(reverse('courses-detail', args=[second.pk]))[0].data['avg_rating'], 4.0)
+
+
+class ConditionalGetTestCase(CourseDataTestCase):
+
+    def assertNotModified(self, url, response, **extra):
+        etag = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], **extra)
+        self.assertEqual(etag.status_code, 304)
+        if response.has_header('Last-Modified'):
+            since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'], **extra)
+            self.assertEqual(since.status_code, 304)
+
+    def test_missing_object_is_not_answered_with_304(self):
+        course = self.create_courses(1)[0]
+        url = reverse('courses-detail', args=[course.pk])
+        etag = self.client.get(url)['ETag']
+        course.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_last_modified_is_sent_for_finished_seconds(self):
+        course = self.create_courses(1)[0]
+        url = reverse('courses-detail', args=[course.pk])
+        self.assertFalse(self.client.get(url).has_header('Last-Modified'))
+        cache.set(version_key(f'course:{course.pk}'), (int(datetime.now().timestamp()) - 10) * 10 ** 9)
+        response = self.client.get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertNotModified(url, response)
+
+    def test_course_detail(self):
+        course = self.create_courses(1)[0]
+        url = reverse('courses-detail', args=[course.pk])
+        response = self.client.get(url)
+        self.assertNotModified(url, response)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'],
+                                          HTTP_ACCEPT_LANGUAGE='ru').status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(course=course, student=self.students[0], stars=5)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_exam_detail(self):
+        course = self.create_courses(1)[0]
+        exam = Exam.objects.create(exam_name='Final', teacher=self.teacher, course=course, duration=30)
+        question = Question.objects.create(exam=exam, text='2 + 2')
+        choice = Choice.objects.create(question=question, text='4', is_correct=True)
+        url = reverse('exam-detail', args=[exam.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('is_correct', json.loads(response.content)['questions'][0]['choices'][0])
+        self.assertNotModified(url, response)
+
+        choice.text = 'four'
+        with self.captureOnCommitCallbacks(execute=True):
+            choice.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_cart_detail(self):
+        student = self.students[0]
+        self.client.force_authenticate(student)
+        url = reverse('cart_detail')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotModified(url, response)
+
+        cart = Cart.objects.get(student=student)
+        with self.captureOnCommitCallbacks(execute=True):
+            CartItem.objects.create(cart=cart, course=self.create_courses(1)[0])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['items']), 1)
+
+
+class RatingHistogramTestCase(CourseDataTestCase):
+
+    def test_histogram_follows_review_changes(self):
+        course = self.create_courses(1)[0]
+        url = reverse('courses-detail', args=[course.pk])
+        reviews = [Review.objects.create(course=course, student=student, stars=stars)
+                   for student, stars in zip(self.students, (5, 5, 3))]
+        reviews[0].stars = 1
+        reviews[0].save()
+        reviews[1].delete()
+
+        response = self.client.get(url)
+        self.assertEqual(response.data['rating_histogram'], {1: 1, 2: 0, 3: 1, 4: 0, 5: 0})
+        self.assertEqual(response.data['avg_rating'], 2.0)
+        self.assertEqual(len(response.data['latest_reviews']), 2)
+
+        Course.objects.filter(pk=course.pk).update(stars_1=0, stars_3=0)
+        call_command('rebuild_course_ratings', stdout=StringIO())
+        course.refresh_from_db()
+        self.assertEqual(course.get_rating_histogram(), {1: 1, 2: 0, 3: 1, 4: 0, 5: 0})
+
+
+class SparseFieldsTestCase(CourseDataTestCase):
+
+    def test_fields_and_expand_on_course_list(self):
+        self.create_courses(3)
+        url = reverse('courses-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'course_name,price,category'})
+        self.assertEqual(set(response.data['results'][0]), {'course_name', 'price', 'category'})
+        self.assertEqual(len(queries), 1)
+
+        response = self.client.get(url, {'fields': 'course_name,category', 'expand': ''})
+        self.assertEqual(response.data['results'][0]['category'], self.category.pk)
+
+        response = self.client.get(url, {'fields': 'course_name,skills', 'expand': 'skills'})
+        self.assertEqual(response.data['results'][0]['skills'], [{'skills': 'skill0'}, {'skills': 'skill1'},
+                                                                 {'skills': 'skill2'}])
+
+    def test_nested_fields_on_cart(self):
+        student = self.students[0]
+        self.client.force_authenticate(student)
+        cart = Cart.objects.create(student=student)
+        CartItem.objects.bulk_create([CartItem(cart=cart, course=course) for course in self.create_courses(3)])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('cart_detail'), {'fields': 'items.course.course_name,items.total_price'})
+        self.assertEqual(set(response.data), {'items'})
+        self.assertEqual(response.data['items'][0]['course'], {'course_name': 'course0'})
+        self.assertNotIn('course__category', ' '.join(q['sql'] for q in queries))
+
+        response = self.client.get(reverse('cart_detail'), {'fields': 'items.course', 'expand': 'items'})
+        self.assertEqual({item['course'] for item in response.data['items']},
+                         set(CartItem.objects.values_list('course_id', flat=True)))
+
+
+@skipUnless(orjson and msgpack, 'orjson и msgpack не установлены')
+class RenderersTestCase(TestCase):
+
+    def test_fast_renderers_match_drf_json(self):
+        data = {'price': Decimal('19.90'), 'day': date(2024, 12, 19),
+                'at': datetime(2024, 12, 19, 5, 19, 1, 123456, tzinfo=timezone.utc), 'name': 'Курс'}
+        expected = json.loads(JSONRenderer().render(data))
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), expected)
+        self.assertEqual(msgpack.unpackb(MessagePackRenderer().render(data)), expected)
+        self.assertEqual(MessagePackParser().parse(BytesIO(msgpack.packb(expected))), expected)
+
+    def test_msgpack_is_negotiated(self):
+        response = self.client.get(reverse('courses-list'), HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['results'], [])
+
+
+class ExamDataTestCase(CourseDataTestCase):
+
+    def create_exam(self, questions=3, passing_score=60):
+        course = self.create_courses(1)[0]
+        course.students.add(*self.students)
+        exam = Exam.objects.create(exam_name='Final', teacher=self.teacher, course=course, duration=30,
+                                   passing_score=passing_score)
+        for number in range(questions):
+            question = Question.objects.create(exam=exam, text=f'question {number}')
+            Choice.objects.bulk_create([
+                Choice(question=question, text='right', is_correct=True),
+                Choice(question=question, text='wrong'),
+            ])
+        return exam
+
+    def start(self, exam, student):
+        self.client.force_authenticate(student)
+        response = self.client.post(reverse('exam-start', args=[exam.pk]))
+        self.assertIn(response.status_code, (200, 201), response.data)
+        return response.data
+
+    def answers(self, exam, right=None):
+        answers = []
+        for number, question in enumerate(exam.questions.order_by('pk')):
+            correct = right is None or number < right
+            choice = question.choices.get(is_correct=correct)
+            answers.append({'question': question.pk, 'choices': [choice.pk]})
+        return answers
+
+
+class ExamGradingTestCase(ExamDataTestCase):
+
+    def test_bulk_submission_is_graded(self):
+        exam = self.create_exam(questions=5)
+        self.start(exam, self.students[0])
+        answers = self.answers(exam, right=3)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('exam-submit', args=[exam.pk]), {'answers': answers}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['score'], 60)
+        self.assertTrue(response.data['passed'])
+        self.assertEqual(UserAnswer.objects.filter(student=self.students[0]).count(), 5)
+        self.assertEqual(UserAnswer.objects.filter(is_correct=True).count(), 3)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('INSERT INTO "course_useranswer"')]), 1)
+
+        self.start(exam, self.students[1])
+        answers = self.answers(exam, right=2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('exam-submit', args=[exam.pk]), {'answers': answers}, format='json')
+        self.assertFalse(response.data['passed'])
+        self.assertNotIn('"course_question"', ' '.join(q['sql'] for q in queries if 'INSERT' not in q['sql']))
+
+    def test_foreign_choices_are_rejected(self):
+        exam = self.create_exam()
+        other = self.create_exam()
+        self.start(exam, self.students[0])
+        answers = self.answers(exam)
+        answers[0]['choices'] = [other.questions.first().choices.first().pk]
+        response = self.client.post(reverse('exam-submit', args=[exam.pk]), {'answers': answers}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UserAnswer.objects.exists())
+
+
+class ExamAttemptTestCase(ExamDataTestCase):
+
+    def heartbeat(self, exam, answers=None):
+        data = {'answers': answers} if answers is not None else {}
+        return self.client.post(reverse('exam-heartbeat', args=[exam.pk]), data, format='json')
+
+    def test_autosave_is_buffered_and_submitted(self):
+        exam = self.create_exam(questions=3)
+        attempt = self.start(exam, self.students[0])
+        self.assertEqual(self.start(exam, self.students[0])['id'], attempt['id'])
+
+        draft = self.answers(exam, right=1)[:1]
+        with self.assertNumQueries(0):
+            response = self.heartbeat(exam, draft)
+        self.assertEqual(response.data['attempt'], attempt['id'])
+        self.assertEqual(ExamAttempt.objects.get().answers, {})
+
+        with self.assertNumQueries(1):
+            self.assertEqual(autosave_buffer.flush(), 1)
+        self.assertEqual(len(ExamAttempt.objects.get().answers), 1)
+
+        answers = self.answers(exam, right=2)
+        self.heartbeat(exam, answers)
+        response = self.client.post(reverse('exam-submit', args=[exam.pk]), {}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['status'], response.data['correct']), (ExamAttempt.SUBMITTED, 2))
+        self.assertEqual(UserAnswer.objects.filter(attempt_id=attempt['id']).count(), 3)
+        self.assertEqual(self.client.post(reverse('exam-submit', args=[exam.pk]), {}, format='json').status_code, 400)
+
+    def test_late_answers_are_rejected(self):
+        exam = self.create_exam(questions=2)
+        self.start(exam, self.students[0])
+        self.heartbeat(exam, self.answers(exam, right=1))
+        ExamAttempt.objects.update(expires_at=datetime.now(timezone.utc) - timedelta(minutes=5))
+        cache.delete(attempt_cache_key(exam.pk, self.students[0].pk))
+
+        response = self.client.post(reverse('exam-submit', args=[exam.pk]), {'answers': self.answers(exam)},
+                                    format='json')
+        self.assertEqual((response.data['status'], response.data['correct']), (ExamAttempt.EXPIRED, 1))
+
+    def test_sweeper_expires_attempts_in_bulk(self):
+        exam = self.create_exam(questions=2)
+        for student in self.students:
+            self.start(exam, student)
+            self.heartbeat(exam, self.answers(exam, right=1))
+        ExamAttempt.objects.filter(student=self.students[0]).update(expires_at=datetime.now(timezone.utc) + timedelta(hours=1))
+        ExamAttempt.objects.exclude(student=self.students[0]).update(expires_at=datetime.now(timezone.utc) - timedelta(hours=1))
+
+        # сборщик работает в отдельном процессе: несброшенных попыток воркера он не знает, черновики берёт из общего кэша
+        autosave_buffer.discard(ExamAttempt.objects.values_list('pk', flat=True))
+        self.assertFalse(ExamAttempt.objects.exclude(answers={}).exists())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(expire_attempts(), 2)
+        self.assertEqual([q['sql'].split()[0] for q in queries if 'SAVEPOINT' not in q['sql']],
+                         ['SELECT', 'INSERT', 'UPDATE'] + ['INSERT', 'UPDATE'] * 2
+                         + ['SELECT', 'INSERT', 'SELECT', 'UPDATE'])
+        self.assertEqual(ExamAttempt.objects.filter(status=ExamAttempt.EXPIRED, score=50).count(), 2)
+        self.assertEqual(UserAnswer.objects.count(), 4)
+        self.assertEqual(ExamAttempt.objects.filter(status=ExamAttempt.IN_PROGRESS).count(), 1)
+
+
+class ExamStatsTestCase(ExamDataTestCase):
+
+    def stats(self):
+        return list(QuestionStats.objects.order_by('pk').values()), list(ChoiceStats.objects.order_by('pk').values())
+
+    def test_stats_are_incremental_and_rebuildable(self):
+        exam = self.create_exam(questions=2)
+        for student, right in zip(self.students, (2, 1, 0)):
+            self.start(exam, student)
+            answers = self.answers(exam, right=right)
+            self.client.post(reverse('exam-submit', args=[exam.pk]), {'answers': answers}, format='json')
+
+        first = exam.questions.order_by('pk').first()
+        stats = first.stats
+        self.assertEqual((stats.attempts, stats.correct, stats.score_sum, stats.correct_score_sum), (3, 2, 150, 150))
+        self.assertEqual(stats.get_difficulty(), 0.667)
+        self.assertEqual(stats.get_discrimination(), 0.866)
+
+        incremental = self.stats()
+        call_command('rebuild_exam_stats', stdout=StringIO())
+        self.assertEqual(self.stats(), incremental)
+
+        self.client.force_authenticate(self.teacher)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('exam_stats', args=[exam.pk]))
+        question = response.data['questions'][0]
+        self.assertEqual((question['attempts'], question['correct']), (3, 2))
+        self.assertEqual(sorted(choice['picks'] for choice in question['choices']), [1, 2])
+
+        self.client.force_authenticate(self.students[0])
+        self.assertEqual(self.client.get(reverse('exam_stats', args=[exam.pk])).status_code, 403)
+
+
+class ExamImportTestCase(ExamDataTestCase):
+
+    def document(self, course, questions=200):
+        return {
+            'exam_name': 'Bank', 'course': course.pk, 'passing_score': 50, 'duration': 60,
+            'questions': [{'text': f'question {i}', 'choices': [{'text': 'right', 'is_correct': True},
+                                                                   {'text': 'wrong'}, {'text': 'also wrong'}]}
+                          for i in range(questions)],
+        }
+
+    def test_json_bank_is_imported_in_bulk(self):
+        course = self.create_courses(1)[0]
+        self.client.force_authenticate(self.teacher)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('exam_import'), self.document(course), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['questions'], 200)
+        self.assertEqual(Choice.objects.filter(question__exam_id=response.data['id']).count(), 600)
+        self.assertLess(len(queries), 20)
+
+        document = self.document(course, questions=3)
+        document['questions'][1]['choices'] = [{'text': 'only one', 'is_correct': True}]
+        response = self.client.post(reverse('exam_import'), document, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['questions']), ['2'])
+        self.assertEqual(Exam.objects.count(), 1)
+
+    def test_csv_errors_are_reported_by_line(self):
+        course = self.create_courses(1)[0]
+        self.client.force_authenticate(self.teacher)
+        rows = 'question,choice,is_correct\n2 + 2,4,1\n,5,\n3 + 3,6,maybe\n,7,0\n'
+        upload = BytesIO(rows.encode())
+        upload.name = 'bank.csv'
+        data = {'file': upload, 'exam_name': 'CSV', 'course': course.pk, 'duration': 30}
+        response = self.client.post(reverse('exam_import'), data, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['lines']), ['4'])
+
+        upload = BytesIO(rows.replace('maybe', 'true').encode())
+        upload.name = 'bank.csv'
+        data['file'] = upload
+        response = self.client.post(reverse('exam_import'), data, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Choice.objects.filter(is_correct=True).count(), 2)
+
+
+class ExamPaperTestCase(ExamDataTestCase):
+
+    def test_paper_is_served_without_queries(self):
+        exam = self.create_exam(questions=2)
+        url = reverse('exam-detail', args=[exam.pk])
+        paper = json.loads(self.client.get(url).content)
+        self.assertEqual(len(paper['questions']), 2)
+        self.assertNotIn('is_correct', paper['questions'][0]['choices'][0])
+        self.assertTrue(list(Path(self.files_root, 'exam_papers', str(exam.pk)).glob('*.json')))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(json.loads(self.client.get(url).content), paper)
+        cache.delete(paper_cache_key(exam.pk, 'en', paper_version(exam.pk)))
+        with self.assertNumQueries(0):
+            self.assertEqual(json.loads(self.client.get(url).content), paper)
+
+    def test_paper_is_republished_after_teacher_edit(self):
+        exam = self.create_exam(questions=1)
+        url = reverse('exam-detail', args=[exam.pk])
+        self.client.get(url)
+        self.client.force_authenticate(self.teacher)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('questions_teacher'), {'exam': exam.pk, 'text': 'new'}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(list(Path(self.files_root, 'exam_papers', str(exam.pk)).glob('*.json'))), 2)
+        with self.assertNumQueries(0):
+            paper = json.loads(self.client.get(url).content)
+        self.assertEqual([question['text'] for question in paper['questions']][-1], 'new')
+
+    def test_paper_keeps_detail_shape_and_negotiation(self):
+        exam = self.create_exam(questions=1)
+        url = reverse('exam-detail', args=[exam.pk])
+        paper = json.loads(self.client.get(url, HTTP_ACCEPT_LANGUAGE='en-gb').content)
+        self.assertEqual(paper['course']['course_name'], exam.course.course_name)
+        for host in ('a.example', 'b.example'):
+            self.assertEqual(json.loads(self.client.get(url, HTTP_HOST=host).content), paper)
+        self.assertEqual(len(list(Path(self.files_root, 'exam_papers', str(exam.pk)).glob('en-*.json'))), 1)
+
+        response = self.client.get(url, {'fields': 'exam_name,course.course_name'})
+        self.assertEqual(response.data, {'exam_name': exam.exam_name, 'course': {'course_name': exam.course.course_name}})
+        if msgpack is not None:
+            response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+            self.assertEqual(response['Content-Type'], 'application/msgpack')
+            self.assertEqual(msgpack.unpackb(response.content)['questions'], paper['questions'])
+
+    def test_paper_follows_only_its_course_and_is_built_once(self):
+        exam = self.create_exam(questions=1)
+        other = self.create_courses(1)[0]
+        version = paper_version(exam.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.save()
+        self.assertEqual(paper_version(exam.pk), version)
+        with self.captureOnCommitCallbacks(execute=True):
+            exam.course.save()
+        self.assertNotEqual(paper_version(exam.pk), version)
+
+        # другой запрос уже собирает билет: этот ждёт его в кэше, а не собирает второй раз
+        url = reverse('exam-detail', args=[exam.pk])
+        key = paper_cache_key(exam.pk, 'en', paper_version(exam.pk))
+        cache.add(f'{key}:lock', 1)
+        with mock.patch('course.exam_papers.publish_paper') as publish, \
+                mock.patch('course.exam_papers.time.sleep', side_effect=lambda _: cache.set(key, b'{"ready": 1}')):
+            self.assertEqual(json.loads(self.client.get(url).content), {'ready': 1})
+        publish.assert_not_called()
+
+
+class ChunkedUploadTestCase(CourseDataTestCase):
+
+    def test_video_is_uploaded_in_chunks_and_resumed(self):
+        course = self.create_courses(1)[0]
+        lesson = Lesson.objects.create(teacher=self.teacher, lesson_name='Intro', content='text', course=course)
+        content = bytes(range(256)) * 600
+        chunk_size = 64 * 1024
+        self.client.force_authenticate(self.teacher)
+        response = self.client.post(reverse('upload-create'), {
+            'target': 'lesson_video', 'object_id': lesson.pk, 'filename': '../intro.mp4', 'size': len(content),
+            'chunk_size': chunk_size,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        session = response.data['id']
+        self.assertEqual(response.data['chunks'], 3)
+
+        def put(number, data=None):
+            data = content[(number - 1) * chunk_size:number * chunk_size] if data is None else data
+            return self.client.put(reverse('upload-chunk', args=[session, number]), data,
+                                   content_type='application/octet-stream')
+
+        self.assertEqual(put(3).status_code, 200)
+        self.assertEqual(put(1, b'short').status_code, 400)
+        self.assertEqual(put(1).status_code, 200)
+        self.assertEqual(self.client.get(reverse('upload-detail', args=[session])).data['received'], [1, 3])
+
+        complete = reverse('upload-complete', args=[session])
+        self.assertEqual(self.client.post(complete, {}, format='json').status_code, 400)
+        put(2)
+        response = self.client.post(complete, {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('sha256', response.data)
+        self.assertEqual(self.client.post(complete, {'sha256': '0' * 64}, format='json').status_code, 400)
+        response = self.client.post(complete, {'sha256': hashlib.sha256(content).hexdigest()}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['status'], UploadSession.COMPLETE)
+        self.assertEqual(response.data['url'], f"http://testserver{reverse('lesson-video', args=[lesson.pk])}")
+        repeated = self.client.post(complete, {'sha256': hashlib.sha256(content).hexdigest()}, format='json')
+        self.assertEqual(repeated.status_code, 400)
+        self.assertIn('status', repeated.data)
+
+        lesson.refresh_from_db()
+        self.assertTrue(lesson.video_file.name.endswith(f'{hashlib.sha256(content).hexdigest()}.mp4'))
+        self.assertEqual(lesson.video_file.url, f'/protected_media/{lesson.video_file.name}')
+        self.assertEqual(MediaBlob.objects.get(name=lesson.video_file.name).ref_count, 1)
+        with lesson.video_file.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+        self.assertFalse(Path(self.files_root, 'chunks', str(session)).exists())
+
+    def test_foreign_target_is_rejected(self):
+        course = self.create_courses(1)[0]
+        lesson = Lesson.objects.create(teacher=self.teacher, lesson_name='Intro', content='text', course=course)
+        self.client.force_authenticate(self.students[0])
+        response = self.client.post(reverse('upload-create'), {
+            'target': 'lesson_video', 'object_id': lesson.pk, 'filename': 'intro.mp4', 'size': 10,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class SubmissionsArchiveTestCase(CourseDataTestCase):
+
+    def test_submissions_are_streamed_as_zip(self):
+        course = self.create_courses(1)[0]
+        assignment = Assignment.objects.create(assignment_name='Homework', course=course, description='text',
+                                               due_date=datetime.now(timezone.utc))
+        for number, student in enumerate(self.students):
+            submission = AssignmentSubmission.objects.create(assignment=assignment)
+            submission.students.add(student)
+            if number < 2:
+                submission.submission_file.save(f'answer{number}.txt', ContentFile(f'answer {number}' * 1000))
+
+        self.client.force_authenticate(self.teacher)
+        response = self.client.get(reverse('assignment_submissions_archive', args=[assignment.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        names = archive.namelist()
+        self.assertEqual(len(names), 3)
+        self.assertEqual(archive.read(names[0]), b'answer 0' * 1000)
+        manifest = list(csv.reader(archive.read('manifest.csv').decode('utf-8-sig').splitlines()))
+        self.assertEqual(len(manifest), 4)
+        self.assertEqual(manifest[3][1], 'student2')
+        self.assertEqual(manifest[3][4], '')
+
+        self.client.force_authenticate(self.students[0])
+        self.assertEqual(self.client.get(reverse('assignment_submissions_archive', args=[assignment.pk])).status_code,
+                         403)
+
+
+class BulkGradeTestCase(CourseDataTestCase):
+
+    def setUp(self):
+        super().setUp()
+        course = self.create_courses(1)[0]
+        self.assignment = Assignment.objects.create(assignment_name='Homework', course=course, description='text',
+                                                    due_date=datetime.now(timezone.utc))
+        self.submissions = AssignmentSubmission.objects.bulk_create([
+            AssignmentSubmission(assignment=self.assignment) for _ in range(50)
+        ])
+        self.url = reverse('assignment_grades', args=[self.assignment.pk])
+        self.client.force_authenticate(self.teacher)
+
+    def test_json_grades_are_applied_in_one_update(self):
+        grades = [{'submission': submission.pk, 'grade': 40 + number}
+                  for number, submission in enumerate(self.submissions)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'grades': grades}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['graded'], 50)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('UPDATE')]), 1)
+        self.assertEqual(AssignmentSubmission.objects.get(pk=self.submissions[9].pk).grade, 49)
+
+        grades[3]['grade'] = 101
+        grades[7]['submission'] = 10 ** 6
+        response = self.client.post(self.url, {'grades': grades}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['grades']), ['4'])
+
+    def test_csv_grades_report_lines(self):
+        other = AssignmentSubmission.objects.create(assignment=Assignment.objects.create(
+            assignment_name='Other', course=self.assignment.course, description='text',
+            due_date=datetime.now(timezone.utc)))
+        rows = f'submission,grade\n{self.submissions[0].pk},90\n{other.pk},80\n'
+        upload = BytesIO(rows.encode())
+        upload.name = 'grades.csv'
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['lines']), ['3'])
+        self.assertFalse(AssignmentSubmission.objects.filter(grade__isnull=False).exists())
+
+
+class GradebookTestCase(ExamDataTestCase):
+
+    def test_gradebook_follows_grades_and_exams(self):
+        exam = self.create_exam(questions=2)
+        course = exam.course
+        assignment = Assignment.objects.create(assignment_name='Homework', course=course, description='text',
+                                               due_date=datetime.now(timezone.utc))
+        submissions = []
+        for student in self.students:
+            submission = AssignmentSubmission.objects.create(assignment=assignment)
+            submission.students.add(student)
+            submissions.append(submission)
+
+        self.client.force_authenticate(self.teacher)
+        grades = [{'submission': submission.pk, 'grade': 70 + number} for number, submission in enumerate(submissions)]
+        self.client.post(reverse('assignment_grades', args=[assignment.pk]), {'grades': grades}, format='json')
+        for right in (1, 2):
+            self.start(exam, self.students[0])
+            self.client.post(reverse('exam-submit', args=[exam.pk]), {'answers': self.answers(exam, right=right)},
+                             format='json')
+        self.start(exam, self.students[0])
+        self.client.post(reverse('exam-submit', args=[exam.pk]), {'answers': self.answers(exam, right=0)},
+                         format='json')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submissions[1].grade = 95
+            submissions[1].save()
+
+        entry = GradebookEntry.objects.get(course=course, student=self.students[0])
+        self.assertEqual(entry.assignment_grades, {str(assignment.pk): 70})
+        self.assertEqual(entry.exam_scores, {str(exam.pk): 100})
+        self.assertEqual(GradebookEntry.objects.get(student=self.students[1]).assignment_grades,
+                         {str(assignment.pk): 95})
+
+        incremental = list(GradebookEntry.objects.order_by('student_id').values_list(
+            'student_id', 'assignment_grades', 'exam_scores'))
+        call_command('rebuild_gradebook', stdout=StringIO())
+        self.assertEqual(list(GradebookEntry.objects.order_by('student_id').values_list(
+            'student_id', 'assignment_grades', 'exam_scores')), incremental)
+
+        self.client.force_authenticate(self.teacher)
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('course_gradebook', args=[course.pk]), {'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        self.assertEqual(response.data['columns']['exams'][0]['id'], exam.pk)
+
+    def test_deleted_submission_leaves_gradebook(self):
+        course = self.create_courses(1)[0]
+        assignment = Assignment.objects.create(assignment_name='Homework', course=course, description='text',
+                                               due_date=datetime.now(timezone.utc))
+        with self.captureOnCommitCallbacks(execute=True):
+            first, second = (AssignmentSubmission.objects.create(assignment=assignment, grade=grade)
+                             for grade in (60, 90))
+            first.students.add(self.students[0])
+            second.students.add(self.students[0])
+        entry = GradebookEntry.objects.get(course=course, student=self.students[0])
+        self.assertEqual(entry.assignment_grades, {str(assignment.pk): 90})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        entry.refresh_from_db()
+        self.assertEqual(entry.assignment_grades, {str(assignment.pk): 60})
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        entry.refresh_from_db()
+        self.assertEqual(entry.assignment_grades, {})
+
+
+class DeadlineSchedulerTestCase(CourseDataTestCase):
+
+    def create_assignment(self, due_in):
+        assignment = Assignment.objects.create(assignment_name=f'due in {due_in}', course=self.course,
+                                               description='text', due_date=datetime.now(timezone.utc) + due_in)
+        assignment.students.add(*self.students)
+        return assignment
+
+    def test_reminders_and_closing(self):
+        self.course = self.create_courses(1)[0]
+        soon = self.create_assignment(timedelta(hours=2))
+        overdue = self.create_assignment(timedelta(hours=-1))
+        self.create_assignment(timedelta(days=3))
+        submission = AssignmentSubmission.objects.create(assignment=soon)
+        submission.students.add(self.students[0])
+
+        with self.assertNumQueries(9):
+            self.assertEqual(send_reminders(), (1, 2))
+        self.assertEqual(set(Notification.objects.filter(kind=Notification.DEADLINE_REMINDER)
+                             .values_list('recipient_id', flat=True)), {self.students[1].pk, self.students[2].pk})
+        self.assertEqual(send_reminders(), (0, 0))
+
+        # уже отправленное уведомление пропускается и в число созданных не попадает
+        Notification.objects.create(recipient=self.students[0], assignment=overdue, kind=Notification.ASSIGNMENT_CLOSED,
+                                    message='closed')
+        output = StringIO()
+        call_command('run_deadline_scheduler', '--once', stdout=output)
+        self.assertIn('закрыто: заданий 1, уведомлений 2', output.getvalue())
+        overdue.refresh_from_db()
+        self.assertTrue(overdue.is_closed)
+        self.assertEqual(Notification.objects.filter(kind=Notification.ASSIGNMENT_CLOSED).count(), 3)
+
+        response = self.client.post(reverse('submission-list'), {'assignment': soon.pk}, format='json')
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(AssignmentSubmission.objects.filter(assignment=soon).exclude(pk=submission.pk).exists())
+
+        self.client.force_authenticate(self.students[1])
+        response = self.client.get(reverse('notification-list'))
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.post(reverse('submission-list'), {'assignment': overdue.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('submission-list'), {'assignment': soon.pk}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(list(AssignmentSubmission.objects.get(pk=response.data['id']).students.all()),
+                         [self.students[1].userprofile_ptr])
+
+
+class ThumbnailTestCase(CourseDataTestCase):
+
+    def png(self, size, color='red'):
+        buffer = BytesIO()
+        Image.new('RGBA', size, color).save(buffer, 'PNG')
+        return SimpleUploadedFile('photo.png', buffer.getvalue(), content_type='image/png')
+
+    def test_variants_are_generated_after_upload(self):
+        course = self.create_courses(1)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            course.course_images = self.png((2000, 1000))
+            course.save()
+        course.refresh_from_db()
+        variants = course.course_images_variants
+        self.assertEqual(variants['source'], course.course_images.name)
+        self.assertEqual(set(variants) - {'source'}, {'64', '256', '1024'})
+        with Image.open(self.files_root / 'media' / variants['64']['webp']) as image:
+            self.assertEqual(image.size, (64, 32))
+        with Image.open(self.files_root / 'media' / variants['1024']['jpeg']) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (1024, 512)))
+
+        response = self.client.get(reverse('courses-list'))
+        card = response.data['results'][0]
+        self.assertNotIn('course_images', card)
+        self.assertEqual(set(card['course_images_thumbnails']), {'64', '256'})
+        self.assertTrue(card['course_images_thumbnails']['256']['webp'].startswith('http://testserver/'))
+
+        old = variants['64']['webp']
+        with self.captureOnCommitCallbacks(execute=True):
+            course.course_images = self.png((300, 300), 'blue')
+            course.save()
+        course.refresh_from_db()
+        self.assertNotEqual(course.course_images_variants['64']['webp'], old)
+        self.assertFalse((self.files_root / 'media' / old).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course.course_images = None
+            course.save()
+        course.refresh_from_db()
+        self.assertEqual(course.course_images_variants, {})
+        self.assertEqual(self.client.get(reverse('courses-list')).data['results'][0]['course_images_thumbnails'], {})
+
+        # без изображения сохранение не дописывает ни варианты, ни сброс кэша сверх собственных сигналов модели
+        student = Student.objects.get(pk=self.students[0].pk)
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks() as callbacks:
+            student.save()
+        self.assertEqual([q['sql'].split()[0] for q in queries].count('UPDATE'), 2)  # userprofile и student
+        self.assertEqual(len(callbacks), 2)  # только invalidate_users: версия и кэш процесса
+
+    def test_original_is_served_until_variants_are_ready(self):
+        course = self.create_courses(1)[0]
+        with self.captureOnCommitCallbacks(execute=False):
+            course.course_images = self.png((500, 500))
+            course.save()
+        card = self.client.get(reverse('courses-list')).data['results'][0]
+        original = f'http://testserver{course.course_images.url}'
+        self.assertEqual(card['course_images_thumbnails'], {'64': {'original': original},
+                                                            '256': {'original': original}})
+
+
+class VideoStreamTestCase(CourseDataTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.course = self.create_courses(1)[0]
+        self.course.students.add(self.students[0])
+        self.data = bytes(range(256)) * 1000
+        self.lesson = Lesson.objects.create(teacher=self.teacher, lesson_name='Intro', content='text',
+                                            course=self.course)
+        self.lesson.video_file.save('intro.mp4', ContentFile(self.data))
+        self.url = reverse('lesson-video', args=[self.lesson.pk])
+
+    def test_ranges(self):
+        self.client.force_authenticate(self.students[0])
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1000-1999', HTTP_ACCEPT='video/*')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1000-1999/{len(self.data)}')
+        self.assertEqual(b''.join(response.streaming_content), self.data[1000:2000])
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10', HTTP_IF_RANGE=etag)
+        self.assertEqual(b''.join(response.streaming_content), self.data[-10:])
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual((response.status_code, response['Content-Length']), (200, str(len(self.data))))
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, f'bytes */{len(self.data)}'))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_only_enrolled_users(self):
+        self.client.force_authenticate(self.students[1])
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_authenticate(self.teacher)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-0')
+        self.assertEqual(b''.join(response.streaming_content), self.data[:1])
+
+
+class MediaBlobTestCase(CourseDataTestCase):
+
+    def test_identical_uploads_share_one_blob(self):
+        course = self.create_courses(1)[0]
+        lessons = [Lesson.objects.create(teacher=self.teacher, lesson_name=f'lesson{i}', content='text',
+                                         course=course) for i in range(2)]
+        for lesson in lessons:
+            lesson.video_file.save('intro.mp4', ContentFile(b'video' * 1000))
+        certificate = Certificate.objects.create(student=self.students[0], course=course)
+        certificate.certificate_file.save('certificate.mp4', ContentFile(b'video' * 1000))
+
+        name = lessons[0].video_file.name
+        self.assertEqual(name, f'blobs/{name[6:8]}/{name[9:11]}/{hashlib.sha256(b"video" * 1000).hexdigest()}.mp4')
+        self.assertEqual({lessons[1].video_file.name, certificate.certificate_file.name}, {name})
+        self.assertEqual(MediaBlob.objects.get().ref_count, 3)
+        self.assertEqual(len(list((self.files_root / 'protected' / 'blobs').glob('*/*/*'))), 1)
+
+        lessons[0].delete()
+        Lesson.objects.get(pk=lessons[1].pk).delete()
+        certificate = Certificate.objects.get(pk=certificate.pk)
+        certificate.certificate_file.save('other.mp4', ContentFile(b'other'))
+        self.assertEqual(dict(MediaBlob.objects.values_list('name', 'ref_count')),
+                         {name: 0, certificate.certificate_file.name: 1})
+
+        Certificate.objects.filter(pk=certificate.pk).update(certificate_file=name)  # мимо сигналов
+        call_command('collect_media_blobs', '--grace-hours=0', stdout=StringIO())
+        self.assertTrue(MediaBlob.objects.filter(name=name).exists())
+        call_command('collect_media_blobs', '--recount', '--grace-hours=0', stdout=StringIO())
+        self.assertEqual(list(MediaBlob.objects.values_list('name', flat=True)), [name])
+        self.assertTrue((self.files_root / 'protected' / name).exists())
+
+    def test_names_are_read_only_when_file_fields_are_saved(self):
+        course = self.create_courses(1)[0]
+        lessons = [Lesson.objects.create(teacher=self.teacher, lesson_name=f'lesson{i}', content='text',
+                                         course=course) for i in range(2)]
+        for lesson in lessons:
+            lesson.video_file.save('intro.mp4', ContentFile(b'video'))
+        self.assertEqual(MediaBlob.objects.get().ref_count, 2)
+        loaded = Lesson.objects.get(pk=lessons[0].pk)
+        self.assertFalse(hasattr(loaded, '_blob_names'))
+
+        loaded.lesson_name = 'renamed'
+        with self.assertNumQueries(1):
+            loaded.save(update_fields=['lesson_name'])
+        loaded.delete()
+        Lesson.objects.only('id', 'lesson_name').get(pk=lessons[1].pk).delete()  # имя читается в pre_delete
+        self.assertEqual(MediaBlob.objects.get().ref_count, 0)
+
+    def test_rolled_back_blob_file_is_collected(self):
+        course = self.create_courses(1)[0]
+        lesson = Lesson.objects.create(teacher=self.teacher, lesson_name='lesson', content='text', course=course)
+        with self.assertRaises(ValueError), transaction.atomic():
+            lesson.video_file.save('intro.mp4', ContentFile(b'lost' * 1000))
+            path = Path(lesson.video_file.path)
+            raise ValueError
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertTrue(path.exists())
+
+        call_command('collect_media_blobs', '--grace-hours=1', stdout=StringIO())
+        self.assertTrue(path.exists())
+        os.utime(path, (0, 0))
+        call_command('collect_media_blobs', '--grace-hours=1', stdout=StringIO())
+        self.assertFalse(path.exists())
+
+
+class ProtectedMediaTestCase(CourseDataTestCase):
+
+    def setUp(self):
+        super().setUp()
+        course = self.create_courses(1)[0]
+        assignment = Assignment.objects.create(assignment_name='Homework', course=course, description='text',
+                                               due_date=datetime.now(timezone.utc) + timedelta(days=1))
+        self.submission = AssignmentSubmission.objects.create(assignment=assignment)
+        self.submission.students.add(self.students[0])
+        self.submission.submission_file.save('answer.pdf', ContentFile(b'%PDF answer'))
+        self.url = reverse('submission-file', args=[self.submission.pk])
+
+    def test_access_is_checked_before_serving(self):
+        self.client.force_authenticate(self.students[1])
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.force_authenticate(self.teacher)
+        response = self.client.get(self.url)
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'application/pdf'))
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF answer')
+
+        self.client.force_authenticate(self.students[0])
+        response = self.client.get(reverse('submission-list'))
+        self.assertEqual(response.data['results'][0]['submission_file'], f'http://testserver{self.url}')
+
+    def test_transfer_is_offloaded_to_web_server(self):
+        self.client.force_authenticate(self.students[0])
+        name = self.submission.submission_file.name
+        with self.settings(PROTECTED_MEDIA_SERVER='nginx'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected_media/{name}')
+        self.assertEqual(response.content, b'')
+        with self.settings(PROTECTED_MEDIA_SERVER='apache'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], str(self.files_root / 'protected' / name))
+
+    def test_access_is_checked_before_missing_file(self):
+        lesson = Lesson.objects.create(teacher=self.teacher, lesson_name='No video', content='text',
+                                       course=self.submission.assignment.course)
+        self.client.force_authenticate(self.students[1])
+        self.assertEqual(self.client.get(reverse('lesson-video', args=[lesson.pk])).status_code, 403)
+        self.client.force_authenticate(self.teacher)
+        self.assertEqual(self.client.get(reverse('lesson-video', args=[lesson.pk])).status_code, 404)
+
+    def test_old_files_and_blobs_are_moved(self):
+        name = self.submission.submission_file.name
+        protected, media = self.files_root / 'protected', self.files_root / 'media'
+        (media / name).parent.mkdir(parents=True)
+        (protected / name).rename(media / name)
+        unreferenced = Path('blobs', 'ab', 'cd', 'abcd.mp4')
+        (media / unreferenced).parent.mkdir(parents=True)
+        (media / unreferenced).write_bytes(b'old')
+        AssignmentSubmission.objects.create(assignment=self.submission.assignment, submission_file='old/answer.pdf')
+        (media / 'old').mkdir()
+        (media / 'old' / 'answer.pdf').write_bytes(b'%PDF old')
+
+        call_command('move_protected_media', stdout=StringIO())
+        for moved in (name, unreferenced, 'old/answer.pdf'):
+            self.assertTrue((protected / moved).exists())
+            self.assertFalse((media / moved).exists())
+
+
+class CachedJWTAuthenticationTestCase(CourseDataTestCase):
+
+    def authenticate(self, token):
+        local_user_cache.clear()
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return CachedJWTAuthentication().authenticate(request)[0]
+
+    def test_user_is_resolved_from_cache(self):
+        token = AccessToken.for_user(self.teacher)
+        with self.assertNumQueries(1):
+            user = self.authenticate(token)
+        self.assertIsInstance(user, Teacher)
+        with self.assertNumQueries(0):
+            user = self.authenticate(token)
+            self.assertTrue(hasattr(user, 'teacher'))
+            self.assertFalse(hasattr(user, 'student'))
+        self.assertEqual(user, self.teacher)
+
+        student = Student.objects.get(pk=self.students[0].pk)
+        token = AccessToken.for_user(student)
+        self.assertEqual(self.authenticate(token), student)
+        student.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            student.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_bulk_update_is_invalidated_after_commit(self):
+        token = AccessToken.for_user(self.teacher)
+        self.assertTrue(self.authenticate(token).is_active)
+        with self.captureOnCommitCallbacks() as callbacks:
+            UserProfile.objects.filter(pk=self.teacher.pk).update(is_active=False)
+            invalidate_users([self.teacher.pk])
+        self.assertIsNotNone(local_user_cache.get(self.teacher.pk))  # до коммита запись прежняя
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(local_user_cache.get(self.teacher.pk))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_role_permissions_use_cached_user(self):
+        course = self.create_courses(1)[0]
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.teacher)}')
+        response = self.client.get(reverse('course_detail_for_detail', args=[course.pk]))
+        self.assertEqual(response.status_code, 200)
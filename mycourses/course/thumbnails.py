@@ -0,0 +1,136 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .cache import bump_catalog, bump_versions
+from .models import Course, Student, Teacher
+
+logger = logging.getLogger(__name__)
+
+# От большего к меньшему: каждый размер уменьшается из предыдущего, а не из оригинала
+THUMBNAIL_SIZES = (1024, 256, 64)
+THUMBNAIL_FORMATS = (('webp', 'WEBP', {'quality': 80, 'method': 4}),
+                     ('jpeg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}))
+THUMBNAIL_ROOT = 'thumbnails'
+
+THUMBNAIL_FIELDS = {
+    Course: 'course_images',
+    Teacher: 'profile_picture',
+    Student: 'student_images',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS, thread_name_prefix='thumbnails')
+        return _executor
+
+
+def variants_field(field):
+    return f'{field}_variants'
+
+
+def thumbnail_name(name, size, extension):
+    return f'{THUMBNAIL_ROOT}/{os.path.splitext(name)[0]}/{size}.{extension}'
+
+
+def without_alpha(image):
+    if image.mode == 'RGB':
+        return image
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def render_variants(name, storage=default_storage):
+    # {'source': имя оригинала, '<размер>': {'webp': путь, 'jpeg': путь}}
+    with storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image.draft('RGB', (THUMBNAIL_SIZES[0], THUMBNAIL_SIZES[0]))  # JPEG декодируется сразу в уменьшенном масштабе
+        image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    variants = {'source': name}
+    for size in THUMBNAIL_SIZES:
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        for extension, image_format, options in THUMBNAIL_FORMATS:
+            buffer = BytesIO()
+            (image if image_format == 'WEBP' else without_alpha(image)).save(buffer, image_format, **options)
+            path = storage.save(thumbnail_name(name, size, extension), ContentFile(buffer.getvalue()))
+            variants.setdefault(str(size), {})[extension] = path
+    return variants
+
+
+def variant_paths(variants):
+    return [path for size, formats in variants.items() if size != 'source' for path in formats.values()]
+
+
+def delete_variants(variants, storage=default_storage):
+    for path in variant_paths(variants):
+        storage.delete(path)
+
+
+def bump_cached(model, pk):
+    # Миниатюры пишутся через update(), сигналы сохранения не срабатывают — кэш каталога сбрасывается здесь
+    if model is Course:
+        bump_catalog([pk])
+    elif model is Teacher:
+        bump_versions([f'course:{course_pk}' for course_pk in Course.objects.filter(teacher_id=pk)
+                      .values_list('pk', flat=True)])
+
+
+def generate_thumbnails(model, pk, field, name, previous=None, in_worker=False):
+    try:
+        variants = render_variants(name)
+        # Если за время обработки загрузили другое изображение, результат уже не нужен
+        if model.objects.filter(pk=pk, **{field: name}).update(**{variants_field(field): variants}):
+            delete_variants(previous or {})
+            bump_cached(model, pk)
+        else:
+            delete_variants(variants)
+        return variants
+    except Exception:
+        logger.exception('Не удалось построить миниатюры %s для %s #%s', name, model.__name__, pk)
+    finally:
+        if in_worker:
+            connection.close()
+
+
+def submit(task):
+    if settings.THUMBNAIL_WORKERS:
+        get_executor().submit(partial(task, in_worker=True))
+    else:
+        task()
+
+
+def schedule_thumbnails(instance, field):
+    # Вызывается после сохранения; миниатюры строятся в пуле потоков после коммита, запрос их не ждёт
+    name = getattr(instance, field).name or ''
+    variants = getattr(instance, variants_field(field)) or {}
+    model = type(instance)
+    if not name:
+        # Изображения нет и не было — правка профиля без картинки не трогает ни строку, ни кэш каталога
+        if variants:
+            model.objects.filter(pk=instance.pk).update(**{variants_field(field): {}})
+            bump_cached(model, instance.pk)
+            transaction.on_commit(partial(delete_variants, variants))
+        return
+    if variants.get('source') == name:
+        return
+    task = partial(generate_thumbnails, model, instance.pk, field, name, variants)
+    transaction.on_commit(partial(submit, task))
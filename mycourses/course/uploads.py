@@ -0,0 +1,122 @@
+import hashlib
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import AssignmentSubmission, CourseLanguages, Lesson, UploadSession
+
+UPLOAD_BLOCK_SIZE = 64 * 1024  # столько байт держится в памяти при записи и сборке файла
+UPLOAD_MIN_CHUNK_SIZE = 64 * 1024
+UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+UPLOAD_DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_MAX_SIZE = 10 * 1024 ** 3
+
+# цель загрузки: (модель, FileField, поле владельца, которому разрешена загрузка)
+UPLOAD_TARGETS = {
+    'submission': (AssignmentSubmission, 'submission_file', 'students'),
+    'lesson_video': (Lesson, 'video_file', 'teacher'),
+    'course_language_video': (CourseLanguages, 'video_filed', 'teacher'),
+}
+
+
+class AssembledFile(File):
+    # FileSystemStorage переносит файл с temporary_file_path() через rename, без повторного копирования
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def target_queryset(target, user_id):
+    model, _, owner_field = UPLOAD_TARGETS[target]
+    return model.objects.filter(**{owner_field: user_id})
+
+
+def session_dir(session):
+    return Path(settings.UPLOAD_CHUNKS_ROOT) / str(session.pk)
+
+
+def chunk_path(session, number):
+    return session_dir(session) / f'{number}.part'
+
+
+def received_chunks(session):
+    directory = session_dir(session)
+    if not directory.exists():
+        return []
+    return sorted(int(path.stem) for path in directory.glob('*.part'))
+
+
+def write_chunk(session, number, stream):
+    # Часть пишется блоками во временный файл и переименовывается целиком — повторная отправка части безопасна
+    if not 1 <= number <= session.get_chunk_count():
+        raise serializers.ValidationError({'chunk': [f'Номер части должен быть от 1 до {session.get_chunk_count()}']})
+    expected = session.get_chunk_length(number)
+    path = chunk_path(session, number)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f'{number}.{uuid.uuid4().hex}.tmp')
+    written = 0
+    try:
+        with open(temporary, 'wb') as output:
+            while written <= expected:
+                block = stream.read(min(UPLOAD_BLOCK_SIZE, expected - written + 1))
+                if not block:
+                    break
+                written += len(block)
+                output.write(block)
+        if written != expected:
+            raise serializers.ValidationError({'chunk': [f'Ожидалось {expected} байт, получено {written}']})
+        os.replace(temporary, path)
+    finally:
+        temporary.unlink(missing_ok=True)
+    return written
+
+
+def assemble(session, expected_sha256):
+    # Части склеиваются в один файл с подсчётом sha256 на лету; при несовпадении части остаются для повтора
+    missing = sorted(set(range(1, session.get_chunk_count() + 1)) - set(received_chunks(session)))
+    if missing:
+        raise serializers.ValidationError({'chunks': [f'Не загружены части: {missing[:20]}']})
+    digest = hashlib.sha256()
+    assembled = session_dir(session) / 'assembled'
+    with open(assembled, 'wb') as output:
+        for number in range(1, session.get_chunk_count() + 1):
+            with open(chunk_path(session, number), 'rb') as chunk:
+                while block := chunk.read(UPLOAD_BLOCK_SIZE):
+                    digest.update(block)
+                    output.write(block)
+    if digest.hexdigest() != expected_sha256.lower():
+        assembled.unlink()
+        raise serializers.ValidationError({'sha256': ['Контрольная сумма не совпадает']})
+    return assembled, digest.hexdigest()
+
+
+def complete_upload(session, expected_sha256):
+    # Сессия блокируется до конца сборки: параллельный повтор запроса ждёт и видит уже завершённую загрузку
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status != UploadSession.OPEN:
+            raise serializers.ValidationError({'status': ['Загрузка уже завершена']})
+        target = target_queryset(session.target, session.owner_id).filter(pk=session.object_id).first()
+        if target is None:
+            raise serializers.ValidationError({'object_id': ['Объект загрузки не найден']})
+        assembled, sha256 = assemble(session, expected_sha256)
+        field = UPLOAD_TARGETS[session.target][1]
+        with open(assembled, 'rb') as stream:
+            file = AssembledFile(stream, name=session.filename)
+            file.sha256 = sha256  # blob_storage использует готовую сумму и не читает файл ещё раз
+            getattr(target, field).save(session.filename, file, save=False)
+        target.save(update_fields=[field])
+        session.status, session.sha256, session.completed_at = UploadSession.COMPLETE, sha256, timezone.now()
+        session.save(update_fields=['status', 'sha256', 'completed_at'])
+    remove_chunks(session)
+    return session, target, field
+
+
+def remove_chunks(session):
+    shutil.rmtree(session_dir(session), ignore_errors=True)
@@ -12,16 +12,30 @@ urlpatterns = [
 
     path('courses/', CourseStudentListAPIView.as_view(), name='courses-list'),
     path('courses/<int:pk>/', CourseStudentRetrieveAPIView.as_view(), name='courses-detail'),
+    path('courses/<int:pk>/reviews/', CourseReviewListAPIView.as_view(), name='courses-reviews'),
 
     path('assignment/', AssignmentListAPIView.as_view(), name='assignment-list'),
     path('assignment/<int:pk>/', AssignmentRetrieveAPIView.as_view(), name='assignment-detail'),
     path('submission/', AssignmentSubmissionListCreateAPIView.as_view(), name='submission-list'),
+    path('submission/<int:pk>/file/', SubmissionFileAPIView.as_view(), name='submission-file'),
+    path('certificates/<int:pk>/file/', CertificateFileAPIView.as_view(), name='certificate-file'),
 
-    path('exam/', ExamListAPIView.as_view(), name='exam-list'),
-    path('exam/<int:pk>/', ExamRetrieveAPIView.as_view(), name='exam-detail'),
+    path('notifications/', NotificationListAPIView.as_view(), name='notification-list'),
+
+    path('uploads/', UploadSessionCreateAPIView.as_view(), name='upload-create'),
+    path('uploads/<uuid:pk>/', UploadSessionRetrieveAPIView.as_view(), name='upload-detail'),
+    path('uploads/<uuid:pk>/chunks/<int:number>/', UploadChunkAPIView.as_view(), name='upload-chunk'),
+    path('uploads/<uuid:pk>/complete/', UploadCompleteAPIView.as_view(), name='upload-complete'),
+
+    path('lessons/<int:pk>/video/', LessonVideoStreamAPIView.as_view(), name='lesson-video'),
+    path('course_languages/<int:pk>/video/', CourseLanguageVideoStreamAPIView.as_view(),
+         name='course-language-video'),
 
     path('exam/', ExamListAPIView.as_view(), name='exam-list'),
     path('exam/<int:pk>/', ExamRetrieveAPIView.as_view(), name='exam-detail'),
+    path('exam/<int:pk>/start/', ExamAttemptStartAPIView.as_view(), name='exam-start'),
+    path('exam/<int:pk>/heartbeat/', ExamAttemptHeartbeatAPIView.as_view(), name='exam-heartbeat'),
+    path('exam/<int:pk>/submit/', ExamSubmitAPIView.as_view(), name='exam-submit'),
 
     path('question/', QuestionListCreateAPIView.as_view(), name='question-list'),
 
@@ -52,11 +66,22 @@ urlpatterns = [
     path('courses_for_teacher/',CourseTeacherListAPIView.as_view(),name = 'course_for_teacher'),
     path('courses_for_teacher/<int:pk>/',CourseTeacherRetrieveAPIView.as_view(),name ='course_detail_for_detail'),
 
+    path('courses_for_teacher/<int:pk>/gradebook/',CourseGradebookAPIView.as_view(),name = 'course_gradebook'),
+
     path('questions/',QuestionTeacherListCreateAPIView.as_view(),name = 'questions_teacher'),
 
-    path('exam/',ExamTeacherListCreateAPIView.as_view(),name = 'exam_list'),
+    path('assignments_for_teacher/<int:pk>/submissions/archive/',AssignmentSubmissionsArchiveAPIView.as_view(),
+         name = 'assignment_submissions_archive'),
+
+    path('assignments_for_teacher/<int:pk>/grades/',AssignmentBulkGradeAPIView.as_view(),name = 'assignment_grades'),
+
+    path('exams_for_teacher/',ExamTeacherListCreateAPIView.as_view(),name = 'exam_list'),
+
+    path('exams_for_teacher/import/',ExamImportAPIView.as_view(),name = 'exam_import'),
+
+    path('exams_for_teacher/<int:pk>/',ExamTeacherRetrieveUpdateDestroyAPIView.as_view(),name = 'exam_detail'),
 
-    path('exam/<int:pk>/',ExamTeacherRetrieveUpdateDestroyAPIView.as_view(),name = 'exam_detail')
+    path('exams_for_teacher/<int:pk>/stats/',ExamStatsAPIView.as_view(),name = 'exam_stats')
 
 
 ]
\ No newline at end of file
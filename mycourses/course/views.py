@@ -1,16 +1,55 @@
-from rest_framework import viewsets, generics,status
+import json
+from io import BytesIO
+
+from rest_framework import viewsets, generics, permissions, status
+from rest_framework.exceptions import NotFound, ParseError, PermissionDenied, ValidationError
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.response import Response
 from .models import *
 from .serializers import *
-from .filters import CourseFilter
+from .filters import CourseFilter, CourseSearchFilter, course_facets
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter
-
-from .permissions import ReviewCreate, UpdateCourse
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.translation import get_language
+
+from .permissions import IsStudent, IsTeacher, ReviewCreate, UpdateCourse
+from .attempts import active_attempt, autosave, is_expired, start_attempt, submit_attempt
+from .grading import answer_key, validate_answers
+from .exam_papers import get_paper, paper_renderer, paper_version_names, publish_exam_papers
+from .exam_import import import_exam, read_exam_csv
+from .uploads import complete_upload, remove_chunks, write_chunk
+from .archives import stream_submissions_zip
+from .streaming import MediaContentNegotiation, serve_protected
+from .assignment_grades import apply_grades, read_grades_csv
+from .cache import CatalogCacheMixin, ConditionalGetMixin
+from .pagination import (CourseCursorPagination, GradebookCursorPagination, OrderCursorPagination,
+                         NotificationCursorPagination, ReviewCursorPagination, SubmissionCursorPagination)
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
 
 
+class SparseFieldsQuerysetMixin:
+    # Подгружает только те связи, которые попадут в ответ при ?fields= / ?expand=
+    select_related_fields = {}
+    prefetch_related_fields = {}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.request
+        full = request.method not in SAFE_METHODS
+        for path, lookup in self.select_related_fields.items():
+            if full or (field_is_requested(request, path) and field_is_expanded(request, path)):
+                queryset = queryset.select_related(lookup)
+        for path, lookup in self.prefetch_related_fields.items():
+            parent = path.rpartition('.')[0]
+            if full or (field_is_requested(request, path) and (not parent or field_is_expanded(request, parent))):
+                queryset = queryset.prefetch_related(lookup)
+        return queryset
+
+
 #FOR STUDENTS
 
 
@@ -70,19 +109,51 @@ class StudentRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
         return Student.objects.filter(username=self.request.user)
 
 
-class CourseStudentListAPIView(generics.ListAPIView):
+class CourseStudentListAPIView(CatalogCacheMixin, SparseFieldsQuerysetMixin, generics.ListAPIView):
     queryset = Course.objects.all()
+    select_related_fields = {'category': 'category'}
+    prefetch_related_fields = {'skills': 'skills'}
     serializer_class = CourseStudentListSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, CourseSearchFilter]
     filterset_class = CourseFilter
-    search_fields = ['course_name']
-
-
-class CourseStudentRetrieveAPIView(generics.RetrieveAPIView):
+    search_fields = ['course_name_en', 'course_name_ru', 'description_en', 'description_ru',
+                     'skills__skills_en', 'skills__skills_ru', 'category__category_name_en',
+                     'category__category_name_ru']
+    pagination_class = CourseCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') in ('1', 'true'):
+            queryset = CourseSearchFilter().filter_queryset(request, self.get_queryset(), self)
+            response.data['facets'] = course_facets(request.query_params, queryset)
+        return response
+
+
+class CourseStudentRetrieveAPIView(ConditionalGetMixin, CatalogCacheMixin, SparseFieldsQuerysetMixin,
+                                   generics.RetrieveAPIView):
+    catalog_cache_versions = ('course:{pk}',)
+    conditional_versions = ('course:{pk}',)
     queryset = Course.objects.all()
+    select_related_fields = {'category': 'category', 'teacher': 'teacher'}
+    prefetch_related_fields = {
+        'skills': 'skills',
+        'latest_reviews': Prefetch(
+            'reviews', to_attr='latest_reviews',
+            queryset=Review.objects.select_related('student').order_by('-created_at', '-id')[:LATEST_REVIEWS_COUNT],
+        ),
+    }
     serializer_class = CourseStudentDetailSerializer
 
 
+class CourseReviewListAPIView(CatalogCacheMixin, generics.ListAPIView):
+    serializer_class = ReviewSerializer
+    pagination_class = ReviewCursorPagination
+    catalog_cache_versions = ('course:{pk}',)
+
+    def get_queryset(self):
+        return Review.objects.filter(course_id=self.kwargs['pk']).select_related('student')
+
+
 class AssignmentListAPIView(generics.ListAPIView):
     queryset = Assignment.objects.all()
     serializer_class = AssignmentStudentListSerializer
@@ -96,16 +167,162 @@ class AssignmentRetrieveAPIView(generics.RetrieveAPIView):
 class AssignmentSubmissionListCreateAPIView(generics.ListCreateAPIView):
     queryset = AssignmentSubmission.objects.all()
     serializer_class = AssignmentSubmissionStudentSerializer
+    pagination_class = SubmissionCursorPagination
+    # решение без автора осталось бы ничьим: отправлять может только вошедший пользователь
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def perform_create(self, serializer):
+        submission = serializer.save()
+        submission.students.add(self.request.user)
 
 
-class ExamListAPIView(generics.ListAPIView):
+class ExamListAPIView(SparseFieldsQuerysetMixin, generics.ListAPIView):
     queryset = Exam.objects.all()
     serializer_class = ExamListStudentSerializer
+    select_related_fields = {'course': 'course', 'course.category': 'course__category'}
+    prefetch_related_fields = {'course.skills': 'course__skills'}
+
+
+class ExamRetrieveAPIView(ConditionalGetMixin, SparseFieldsQuerysetMixin, generics.RetrieveAPIView):
+    # Полный экзамен в формате первого рендерера отдаётся заранее собранным билетом (см. exam_papers) без запросов
+    # к БД; другой формат, ?fields= или ?expand= сериализуются как обычно
+    queryset = Exam.objects.all()
+    serializer_class = ExamPaperSerializer
+    select_related_fields = {'course': 'course', 'course.category': 'course__category'}
+    prefetch_related_fields = {
+        'course.skills': 'course__skills',
+        'questions': 'questions',
+        'questions.choices': 'questions__choices',
+    }
+
+    def get_conditional_versions(self):
+        return paper_version_names(self.kwargs['pk'])
+
+    def uses_paper(self, request):
+        renderer = paper_renderer()
+        return (type(request.accepted_renderer) is type(renderer) and request.accepted_media_type == renderer.media_type
+                and not {'fields', 'expand'} & set(request.query_params))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.uses_paper(request):
+            return super().retrieve(request, *args, **kwargs)
+        try:
+            content = get_paper(self.kwargs['pk'], get_language())
+        except Exam.DoesNotExist:
+            raise Http404
+        return HttpResponse(content, content_type=request.accepted_media_type)
+
+
+class ProtectedFileMixin:
+    # Файлы из blob_storage: права проверяет Django, байты отдаёт веб-сервер (X-Accel-Redirect / X-Sendfile)
+    # или, без него, streaming.stream_file с поддержкой Range
+    file_field = None
+    permission_classes = [permissions.IsAuthenticated]
+    content_negotiation_class = MediaContentNegotiation
+
+    def check_file_access(self, obj):
+        pass
+
+    def get(self, request, *args, **kwargs):
+        obj = self.get_object()
+        self.check_file_access(obj)  # до проверки файла: иначе по 404/403 видно, у кого из чужих он загружен
+        file = getattr(obj, self.file_field)
+        if not file:
+            raise NotFound('Файл не найден')
+        try:
+            return serve_protected(request, file)
+        except FileNotFoundError:
+            raise NotFound('Файл не найден')
+
+
+class CourseVideoStreamMixin(ProtectedFileMixin):
+    # Видео доступно только записанным на курс студентам и его преподавателю
+    def check_file_access(self, obj):
+        user_id = self.request.user.pk
+        if not Course.objects.filter(Q(teacher_id=user_id) | Q(students__pk=user_id), pk=obj.course_id).exists():
+            raise PermissionDenied('Вы не записаны на этот курс')
 
 
-class ExamRetrieveAPIView(generics.RetrieveAPIView):
+class LessonVideoStreamAPIView(CourseVideoStreamMixin, generics.GenericAPIView):
+    queryset = Lesson.objects.only('id', 'course_id', 'video_file')
+    file_field = 'video_file'
+
+
+class CourseLanguageVideoStreamAPIView(CourseVideoStreamMixin, generics.GenericAPIView):
+    queryset = CourseLanguages.objects.only('id', 'course_id', 'video_filed')
+    file_field = 'video_filed'
+
+
+class SubmissionFileAPIView(ProtectedFileMixin, generics.GenericAPIView):
+    # Файл решения видят его авторы, преподаватель задания и преподаватель курса
+    file_field = 'submission_file'
+
+    def get_queryset(self):
+        user_id = self.request.user.pk
+        return (AssignmentSubmission.objects.filter(Q(students__pk=user_id) | Q(assignment__teacher__pk=user_id) |
+                                                    Q(assignment__course__teacher_id=user_id))
+                .distinct().only('id', 'submission_file'))
+
+
+class CertificateFileAPIView(ProtectedFileMixin, generics.GenericAPIView):
+    file_field = 'certificate_file'
+
+    def get_queryset(self):
+        user_id = self.request.user.pk
+        return (Certificate.objects.filter(Q(student_id=user_id) | Q(course__teacher_id=user_id))
+                .only('id', 'certificate_file'))
+
+
+class ExamAttemptMixin:
     queryset = Exam.objects.all()
-    serializer_class = ExamDetailStudentSerializer
+    serializer_class = ExamSubmissionSerializer
+    permission_classes = [IsStudent]
+
+    def get_enrolled_exam(self):
+        exam = self.get_object()
+        if not Course.students.through.objects.filter(course_id=exam.course_id, student_id=self.request.user.pk).exists():
+            raise PermissionDenied('Студент не записан на курс этого экзамена')
+        return exam
+
+    def get_answers(self):
+        serializer = self.get_serializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data.get('answers')
+
+
+class ExamAttemptStartAPIView(ExamAttemptMixin, generics.GenericAPIView):
+    serializer_class = ExamAttemptSerializer
+
+    def post(self, request, *args, **kwargs):
+        attempt, created = start_attempt(self.get_enrolled_exam(), request.user.pk)
+        return Response(self.get_serializer(attempt).data,
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class ExamAttemptHeartbeatAPIView(ExamAttemptMixin, generics.GenericAPIView):
+    # Heartbeat и автосохранение: время проверяется по кэшу, черновик кладётся в общий кэш, в БД уходит пачкой
+    def post(self, request, *args, **kwargs):
+        active = active_attempt(self.kwargs['pk'], request.user.pk)
+        if active is None:
+            raise NotFound('Нет активной попытки этого экзамена')
+        attempt_id, expires_at = active
+        if is_expired(expires_at):
+            return Response(submit_attempt(self.kwargs['pk'], request.user.pk))
+        answers = self.get_answers()
+        if answers is not None:
+            validate_answers(answer_key(self.kwargs['pk']), answers)
+            autosave(attempt_id, answers)
+        remaining = max((expires_at - timezone.now()).total_seconds(), 0)
+        return Response({'attempt': attempt_id, 'status': ExamAttempt.IN_PROGRESS, 'expires_at': expires_at,
+                         'remaining': int(remaining)})
+
+
+class ExamSubmitAPIView(ExamAttemptMixin, generics.GenericAPIView):
+    # Все ответы попытки приходят одним запросом и проверяются по кэшированному ключу ответов
+    def post(self, request, *args, **kwargs):
+        answers = self.get_answers()
+        result = submit_attempt(self.kwargs['pk'], request.user.pk, answers)
+        return Response(result, status=status.HTTP_201_CREATED)
 
 
 class QuestionListCreateAPIView(generics.ListCreateAPIView):
@@ -116,6 +333,7 @@ class QuestionListCreateAPIView(generics.ListCreateAPIView):
 class ReviewCreateAPIView(generics.ListCreateAPIView):
     queryset = Review.objects.all()
     serializer_class = ReviewCreateSerializer
+    pagination_class = ReviewCursorPagination
     permission_classes = [ReviewCreate]
 
 
@@ -125,25 +343,42 @@ class ReviewDeleteAPIView(generics.RetrieveDestroyAPIView):
     permission_classes = [ReviewCreate]
 
 
-class CartRetrieveAPIView(generics.RetrieveAPIView):
+class CartRetrieveAPIView(ConditionalGetMixin, SparseFieldsQuerysetMixin, generics.RetrieveAPIView):
+    queryset = Cart.objects.all()
     serializer_class = CartSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    select_related_fields = {'student': 'student'}
+    prefetch_related_fields = {
+        'items': 'items',
+        'items.course': 'items__course',
+        'items.course.category': 'items__course__category',
+        'items.course.skills': 'items__course__skills',
+    }
 
     def get_queryset(self):
-        return Cart.objects.filter(user=self.request.user)
+        return super().get_queryset().filter(student_id=self.request.user.pk)
+
+    def get_conditional_versions(self):
+        # В корзине выводятся курсы, поэтому она зависит и от версии каталога
+        return [f'cart:{self.request.user.pk}', 'catalog']
 
     def retrieve(self, request, *args, **kwargs):
-        cart, created = Cart.objects.get_or_create(user=request.user)
+        cart, created = Cart.objects.get_or_create(student_id=request.user.pk)
+        cart = self.get_queryset().get(pk=cart.pk)
         serializer = self.get_serializer(cart)
         return Response(serializer.data)
 
-class CartItemListCreateAPIView(generics.ListCreateAPIView):
+class CartItemListCreateAPIView(SparseFieldsQuerysetMixin, generics.ListCreateAPIView):
+    queryset = CartItem.objects.all()
     serializer_class = CartItemSerializer
+    select_related_fields = {'course': 'course', 'course.category': 'course__category'}
+    prefetch_related_fields = {'course.skills': 'course__skills'}
 
     def get_queryset(self):
-        return CartItem.objects.filter(cart__user=self.request.user)
+        return super().get_queryset().filter(cart__student_id=self.request.user.pk)
 
     def perform_create(self, serializer):
-        cart, created = Cart.objects.get_or_create(user=self.request.user)
+        cart, created = Cart.objects.get_or_create(student_id=self.request.user.pk)
         serializer.save(cart=cart)
 
 
@@ -151,10 +386,10 @@ class CartItemRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView
     serializer_class = CartItemSerializer
 
     def get_queryset(self):
-        return CartItem.objects.filter(cart__user=self.request.user)
+        return CartItem.objects.filter(cart__student_id=self.request.user.pk)
 
     def perform_create(self, serializer):
-        cart, created = Cart.objects.get_or_create(user=self.request.user)
+        cart, created = Cart.objects.get_or_create(student_id=self.request.user.pk)
         serializer.save(cart=cart)
 
 
@@ -162,6 +397,7 @@ class CartItemRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView
 class OrderListCreateAPIView(generics.ListCreateAPIView):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    pagination_class = OrderCursorPagination
 
     def get_queryset(self):
         return Order.objects.filter(student=self.request.user)
@@ -230,31 +466,201 @@ class CourseLanguagesDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CourseLanguagesSerializer
 
 
-class CourseTeacherListAPIView(generics.ListCreateAPIView):
+class CourseTeacherListAPIView(SparseFieldsQuerysetMixin, generics.ListCreateAPIView):
     queryset = Course.objects.all()
+    select_related_fields = {'category': 'category'}
+    prefetch_related_fields = {'skills': 'skills'}
     serializer_class = CourseTeachersListSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter]
+    filter_backends = [DjangoFilterBackend, CourseSearchFilter]
     filterset_class = CourseFilter
-    search_fields = ['course_name']
+    search_fields = ['course_name_en', 'course_name_ru', 'description_en', 'description_ru',
+                     'skills__skills_en', 'skills__skills_ru', 'category__category_name_en',
+                     'category__category_name_ru']
+    pagination_class = CourseCursorPagination
     permission_classes = [UpdateCourse,]
 
 
-class CourseTeacherRetrieveAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Course.objects.all()
+class CourseTeacherRetrieveAPIView(SparseFieldsQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
+    # teacher подгружается всегда: он нужен для проверки прав UpdateCourse
+    queryset = Course.objects.select_related('teacher')
+    select_related_fields = {'category': 'category'}
+    prefetch_related_fields = {'skills': 'skills', 'course_languages': 'course_languages'}
     serializer_class = CourseTeachersDetailSerializer
     permission_classes = [UpdateCourse]
 
 
-class QuestionTeacherListCreateAPIView(generics.ListCreateAPIView):
-    queryset = Question.objects.all()
+class ExamPaperPublishMixin:
+    # После правки экзамена преподавателем билеты пересобираются сразу, чтобы студенты получали готовые байты
+
+    def publish_papers(self, exam_id):
+        transaction.on_commit(lambda: publish_exam_papers(exam_id))
+
+
+class QuestionTeacherListCreateAPIView(ExamPaperPublishMixin, generics.ListCreateAPIView):
+    queryset = Question.objects.prefetch_related('choices')
     serializer_class = QuestionTeachersSerializer
 
+    def perform_create(self, serializer):
+        question = serializer.save()
+        self.publish_papers(question.exam_id)
+
 
-class ExamTeacherListCreateAPIView(generics.ListCreateAPIView):
+class ExamTeacherListCreateAPIView(ExamPaperPublishMixin, generics.ListCreateAPIView):
     queryset = Exam.objects.all()
     serializer_class = ExamListTeachersSerializer
 
+    def perform_create(self, serializer):
+        exam = serializer.save()
+        self.publish_papers(exam.pk)
 
-class ExamTeacherRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Exam.objects.all()
+
+class ExamTeacherRetrieveUpdateDestroyAPIView(ExamPaperPublishMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Exam.objects.prefetch_related('questions__choices')
     serializer_class = ExamDetailTeachersSerializer
+
+    def perform_update(self, serializer):
+        exam = serializer.save()
+        self.publish_papers(exam.pk)
+
+
+class ExamStatsAPIView(generics.RetrieveAPIView):
+    # Анализ заданий для преподавателя: три запроса (экзамен с teacher для UpdateCourse, вопросы, варианты)
+    # независимо от числа ответов
+    queryset = Exam.objects.select_related('teacher').prefetch_related(
+        Prefetch('questions', Question.objects.select_related('stats').order_by('pk')),
+        Prefetch('questions__choices', Choice.objects.select_related('stats').order_by('pk')),
+    )
+    serializer_class = ExamStatsSerializer
+    permission_classes = [UpdateCourse]
+
+
+class ExamImportAPIView(generics.CreateAPIView):
+    # Экзамен целиком одним запросом: JSON в теле или файлом (.json / .csv) в поле file
+    serializer_class = ExamImportSerializer
+    permission_classes = [IsTeacher]
+
+    def create(self, request, *args, **kwargs):
+        upload, lines = request.FILES.get('file'), None
+        if upload is None:
+            data = request.data
+        elif upload.name.lower().endswith('.csv'):
+            data, lines = read_exam_csv(upload, request.data)
+        else:
+            try:
+                data = json.load(upload)
+            except ValueError as exc:
+                raise ParseError(f'JSON parse error - {exc}')
+        exam = import_exam(data, request.user.teacher, lines)
+        return Response({'id': exam.pk, 'exam_name': exam.exam_name, 'questions': exam.questions.count()},
+                        status=status.HTTP_201_CREATED)
+
+
+class UploadSessionMixin:
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(owner_id=self.request.user.pk)
+
+
+class UploadSessionCreateAPIView(UploadSessionMixin, generics.CreateAPIView):
+    def perform_create(self, serializer):
+        serializer.save(owner_id=self.request.user.pk)
+
+
+class UploadSessionRetrieveAPIView(UploadSessionMixin, generics.RetrieveDestroyAPIView):
+    # GET показывает, какие части уже получены, — по нему клиент продолжает оборванную загрузку
+
+    def perform_destroy(self, instance):
+        remove_chunks(instance)
+        instance.delete()
+
+
+class UploadChunkAPIView(UploadSessionMixin, generics.GenericAPIView):
+    # Тело запроса — сырые байты части; читается потоком, без разбора парсерами DRF
+    def put(self, request, *args, **kwargs):
+        session = self.get_object()
+        if session.status != UploadSession.OPEN:
+            raise ValidationError({'status': ['Загрузка уже завершена']})
+        written = write_chunk(session, self.kwargs['number'], request.stream or BytesIO())
+        return Response({'chunk': self.kwargs['number'], 'size': written})
+
+
+class UploadCompleteAPIView(UploadSessionMixin, generics.GenericAPIView):
+    def post(self, request, *args, **kwargs):
+        serializer = UploadCompleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session, target, field = complete_upload(self.get_object(), serializer.validated_data['sha256'])
+        data = self.get_serializer(session).data
+        data['url'] = protected_file_url(target, field, request)
+        return Response(data)
+
+
+class TeacherAssignmentMixin:
+    # Задание доступно его преподавателям и преподавателю курса
+    permission_classes = [IsTeacher]
+
+    def get_queryset(self):
+        user_id = self.request.user.pk
+        return Assignment.objects.filter(Q(teacher__pk=user_id) | Q(course__teacher_id=user_id)).distinct()
+
+
+class AssignmentSubmissionsArchiveAPIView(TeacherAssignmentMixin, generics.GenericAPIView):
+    # Все решения задания одним ZIP, собираемым на лету; память не зависит от числа и размера файлов
+
+    def get(self, request, *args, **kwargs):
+        assignment = self.get_object()
+        submissions = (assignment.submissions.order_by('submitted_at', 'pk')
+                       .prefetch_related(Prefetch('students', UserProfile.objects.only('username', 'first_name',
+                                                                                       'last_name'))))
+        response = StreamingHttpResponse(stream_submissions_zip(submissions), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="assignment-{assignment.pk}-submissions.zip"'
+        return response
+
+
+class AssignmentBulkGradeAPIView(TeacherAssignmentMixin, generics.GenericAPIView):
+    # Оценки всей группы одним запросом: JSON {"grades": [{"submission", "grade"}]} или CSV в поле file
+    serializer_class = BulkGradeSerializer
+
+    def post(self, request, *args, **kwargs):
+        assignment = self.get_object()
+        upload, lines = request.FILES.get('file'), None
+        if upload is None:
+            data = request.data
+        else:
+            data, lines = read_grades_csv(upload)
+        graded = apply_grades(assignment, data, lines)
+        return Response({'assignment': assignment.pk, 'graded': len(graded)})
+
+
+class CourseGradebookAPIView(generics.ListAPIView):
+    # Журнал читается готовыми строками GradebookEntry; columns — названия заданий и экзаменов для шапки
+    serializer_class = GradebookEntrySerializer
+    pagination_class = GradebookCursorPagination
+    permission_classes = [IsTeacher]
+
+    def get_queryset(self):
+        return (GradebookEntry.objects.filter(course_id=self.kwargs['pk'])
+                .select_related('student').only('course_id', 'student_id', 'assignment_grades', 'exam_scores',
+                                                'updated_at', 'student__username', 'student__first_name',
+                                                'student__last_name'))
+
+    def list(self, request, *args, **kwargs):
+        if not Course.objects.filter(pk=self.kwargs['pk'], teacher_id=request.user.pk).exists():
+            raise NotFound('Курс не найден')
+        response = super().list(request, *args, **kwargs)
+        response.data['columns'] = {
+            'assignments': list(Assignment.objects.filter(course_id=self.kwargs['pk']).order_by('due_date', 'pk')
+                                .values('id', 'assignment_name', 'due_date')),
+            'exams': list(Exam.objects.filter(course_id=self.kwargs['pk']).order_by('pk').values('id', 'exam_name')),
+        }
+        return response
+
+
+class NotificationListAPIView(generics.ListAPIView):
+    serializer_class = NotificationSerializer
+    pagination_class = NotificationCursorPagination
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Notification.objects.filter(recipient_id=self.request.user.pk)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 import os
 from dotenv import load_dotenv
@@ -144,13 +145,50 @@ MEDIA_URL = '/media/'
 
 STATIC_URL = 'static/'
 
+# Готовые билеты экзаменов; каталог не должен раздаваться как медиа
+EXAM_PAPERS_ROOT = os.path.join(BASE_DIR, 'exam_papers')
+UPLOAD_CHUNKS_ROOT = os.path.join(BASE_DIR, 'upload_chunks')  # части незавершённых загрузок
+# Решения, сертификаты и видео уроков: вне MEDIA_ROOT, отдаются только после проверки прав.
+# PROTECTED_MEDIA_SERVER: 'nginx' — X-Accel-Redirect на internal-location PROTECTED_MEDIA_INTERNAL_URL,
+# 'apache' — X-Sendfile с полным путём; None — файл отдаёт сам Django (для разработки)
+PROTECTED_MEDIA_ROOT = os.path.join(BASE_DIR, 'protected_media')
+PROTECTED_MEDIA_SERVER = None
+PROTECTED_MEDIA_INTERNAL_URL = '/protected_media/'
+THUMBNAIL_WORKERS = 2  # потоки для миниатюр изображений; 0 — строить сразу в запросе
+
+# В продакшене нужен общий для всех воркеров кэш (Redis/Memcached), иначе инвалидация видна только одному процессу,
+# а черновики экзаменов (attempts.AutosaveBuffer) — сборщику expire_exam_attempts
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'course.authentication.CachedJWTAuthentication',
     ),
-    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend']
+    'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    'DEFAULT_PAGINATION_CLASS': 'course.pagination.DefaultCursorPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 
 }
+
+# Быстрые рендереры/парсеры подключаются, только если установлены orjson и msgpack
+if find_spec('orjson'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'][0] = 'course.renderers.ORJSONRenderer'
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'][0] = 'course.renderers.ORJSONParser'
+if find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('course.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('course.renderers.MessagePackParser')
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 